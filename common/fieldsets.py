@@ -0,0 +1,95 @@
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ParseError
+
+FIELDSET_PARAMS = ("fields", "expand", "exclude")
+
+
+class SparseFieldsetsMixin:
+    """
+    Mixin for views which serialize only the fields named in the comma
+    separated `fields`, `expand` and `exclude` query params. Unknown field
+    names return an `HTTP 400 Bad Request` response.
+
+    - `fields` selects the serialized fields e.g. `?fields=id,name`.
+    - `expand` selects relations in addition to `fields`. Without `fields`,
+      every field except the relations not named in `expand` is serialized
+      e.g. `?expand=genres`.
+    - `exclude` leaves fields out e.g. `?exclude=principals,crew`.
+
+    Without any of these params, every field is serialized.
+
+    Relations are the fields in `select_related_fields` and
+    `prefetch_related_fields`, which map each field to the lookups it
+    reads. get_queryset adds the lookups of serialized fields only, so the
+    view's queryset should not select or prefetch them itself.
+    """
+
+    select_related_fields = {}
+    prefetch_related_fields = {}
+
+    def get_fieldset_param(self, name, field_names):
+        value = self.request.query_params.get(name)
+        if not value:
+            return set()
+
+        names = set(value.split(","))
+        unknown = names.difference(field_names)
+        if unknown:
+            raise ParseError(
+                f"`{name}` contains unknown fields: "
+                f"{', '.join(sorted(unknown))}"
+            )
+
+        return names
+
+    @cached_property
+    def serialized_fields(self):
+        """
+        Set of the names of the serialized fields, or None if every field is
+        serialized.
+        """
+
+        field_names = self.get_serializer_class().Meta.fields
+        fields, expand, exclude = [
+            self.get_fieldset_param(name, field_names)
+            for name in FIELDSET_PARAMS
+        ]
+
+        if not (fields or expand or exclude):
+            return None
+
+        if fields:
+            selected = fields | expand
+        elif expand:
+            relations = set(self.select_related_fields)
+            relations.update(self.prefetch_related_fields)
+            selected = set(field_names) - (relations - expand)
+        else:
+            selected = set(field_names)
+
+        return selected - exclude
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.serialized_fields
+
+        for field, lookups in self.select_related_fields.items():
+            if fields is None or field in fields:
+                queryset = queryset.select_related(*lookups)
+        for field, lookups in self.prefetch_related_fields.items():
+            if fields is None or field in fields:
+                queryset = queryset.prefetch_related(*lookups)
+
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.serialized_fields
+
+        if fields is not None:
+            serializer_fields = getattr(serializer, "child", serializer).fields
+            for name in list(serializer_fields):
+                if name not in fields:
+                    serializer_fields.pop(name)
+
+        return serializer
@@ -0,0 +1,128 @@
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+
+def get_rendition_name(name, rendition):
+    """
+    Returns the storage name of a rendition of an image, which is stored
+    next to the original e.g. `title/poster.png.thumbnail.jpg` for
+    `title/poster.png`. The original's extension is kept, so that the
+    renditions of images which only differ by extension do not collide.
+    """
+
+    return f"{name}.{rendition}.jpg"
+
+
+def create_renditions(name, storage=None, force=False):
+    """
+    Creates the renditions of a stored image, see IMAGE_RENDITIONS. Each
+    rendition is the image scaled down to fit its box, and saved as a JPEG.
+    Renditions which exist already are kept, unless `force` is True. Images
+    which Pillow can not read are logged and skipped.
+
+    Args:
+        name: storage name of the image
+        storage: storage of the image, the default storage if None
+        force: whether to recreate existing renditions
+
+    Returns:
+        count: number of renditions created
+    """
+
+    storage = storage or default_storage
+    renditions = {
+        rendition: get_rendition_name(name, rendition)
+        for rendition in settings.IMAGE_RENDITIONS
+    }
+    if not force:
+        renditions = {
+            rendition: rendition_name
+            for rendition, rendition_name in renditions.items()
+            if not storage.exists(rendition_name)
+        }
+    if not renditions:
+        return 0
+
+    try:
+        with storage.open(name) as file:
+            image = Image.open(file)
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except (OSError, Image.DecompressionBombError) as error:
+        logger.warning("Could not read image %s: %s", name, error)
+        return 0
+
+    for rendition, rendition_name in renditions.items():
+        scaled = image.copy()
+        scaled.thumbnail(settings.IMAGE_RENDITIONS[rendition], Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        scaled.save(
+            buffer,
+            "JPEG",
+            quality=settings.IMAGE_RENDITION_QUALITY,
+            optimize=True,
+        )
+        if storage.exists(rendition_name):
+            storage.delete(rendition_name)
+        storage.save(rendition_name, ContentFile(buffer.getvalue()))
+
+    return len(renditions)
+
+
+def delete_renditions(name, storage=None):
+    """
+    Deletes the renditions of a stored image, see create_renditions.
+    """
+
+    storage = storage or default_storage
+    for rendition in settings.IMAGE_RENDITIONS:
+        storage.delete(get_rendition_name(name, rendition))
+
+
+def create_image_renditions(sender, instance, update_fields, **kwargs):
+    """
+    `post_save` receiver which creates the renditions of the `image` field
+    of a saved instance, unless the save left the image out. Connect it for
+    each model with an `image` field.
+    """
+
+    if not instance.image or (update_fields and "image" not in update_fields):
+        return
+
+    create_renditions(instance.image.name, instance.image.storage)
+
+
+class ImageRenditionsField(serializers.Field):
+    """
+    Read-only serializer field for the URLs of the renditions of an image
+    field, e.g. `{"thumbnail": url, "medium": url}`, or None if there is no
+    image. URLs are absolute if the request is in the serializer context,
+    as in ImageField.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+
+        request = self.context.get("request")
+        urls = {}
+
+        for rendition in settings.IMAGE_RENDITIONS:
+            url = value.storage.url(get_rendition_name(value.name, rendition))
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[rendition] = url
+
+        return urls
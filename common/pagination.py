@@ -0,0 +1,333 @@
+import base64
+import datetime
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def get_table_row_estimate(queryset):
+    """
+    Returns the row count estimate of the queryset's table from the table
+    statistics, or None if the queryset is filtered or the database does not
+    keep an estimate. The estimate is only available on MySQL, where it is
+    read from `information_schema.TABLES` instead of scanning the table.
+    """
+
+    query = queryset.query
+    connection = connections[queryset.db]
+
+    if connection.vendor != "mysql":
+        return None
+    if query.where or query.distinct or query.combinator:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+
+    return row[0] if row else None
+
+
+def get_count_result(queryset):
+    """
+    Returns the count of a queryset as a `(count, is_estimate)` tuple. The
+    count of an unfiltered queryset is estimated from the table statistics
+    where available, see get_table_row_estimate, and other querysets are
+    counted exactly.
+    """
+
+    estimate = get_table_row_estimate(queryset)
+    if estimate is not None:
+        return estimate, True
+
+    return queryset.count(), False
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator which takes counts from object lists which cache them, e.g.
+    the cached results of catalog searches. Such lists provide their
+    `(count, is_estimate)` in a `count_result` attribute. If the count is
+    an estimate, `count_is_estimate` is True and pages past the estimated
+    count are not rejected.
+
+    Other object lists, including querysets, are counted exactly on every
+    request, so that their counts and pages never lag behind new rows.
+    """
+
+    @cached_property
+    def count_result(self):
+        object_list = self.object_list
+        if hasattr(object_list, "count_result"):
+            return object_list.count_result
+        if isinstance(object_list, QuerySet):
+            return object_list.count(), False
+
+        return len(object_list), False
+
+    @property
+    def count(self):
+        return self.count_result[0]
+
+    @property
+    def count_is_estimate(self):
+        return self.count_result[1]
+
+    def validate_number(self, number):
+        if not self.count_is_estimate:
+            return super().validate_number(number)
+
+        # An estimate may be lower than the real count, so only the lower
+        # bound of the page number is checked.
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+
+        return number
+
+    def page(self, number):
+        if not self.count_is_estimate:
+            return super().page(number)
+
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        return self._get_page(self.object_list[bottom:top], number, self)
+
+
+class CachedCountPagination(PageNumberPagination):
+    """
+    Page number pagination class which serves the counts of cached object
+    lists, see CachedCountPaginator. Responses report whether the count is exact in
+    `count_is_estimate`.
+    """
+
+    django_paginator_class = CachedCountPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data[
+            "count_is_estimate"
+        ] = self.page.paginator.count_is_estimate
+        return response
+
+
+def get_keyset_ordering(queryset):
+    """
+    Returns the ordering of a queryset as a list of `(field, descending)`
+    tuples. The primary key is appended if it is not already part of the
+    ordering, so that every row has a unique position.
+    """
+
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    keyset = []
+
+    for field in ordering:
+        if not isinstance(field, str) or field == "?":
+            raise ImproperlyConfigured(
+                "Keyset pagination requires ordering by field names"
+            )
+
+        if field.startswith("-"):
+            keyset.append((field[1:], True))
+        else:
+            keyset.append((field, False))
+
+    pk_name = queryset.model._meta.pk.name
+    if not any(field in ("pk", pk_name) for field, _ in keyset):
+        keyset.append((pk_name, False))
+
+    return keyset
+
+
+def get_row_value(row, field):
+    """
+    Reads the value of an ordering field from a model instance or a row
+    returned by `values()`. Fields of related models are separated with
+    `__`, as in lookups.
+    """
+
+    if isinstance(row, dict):
+        return row[field]
+
+    for attribute in field.split("__"):
+        row = getattr(row, attribute)
+
+    return row
+
+
+def get_ordering_field(queryset, name):
+    """
+    Returns the model field or annotation output field of an ordering field
+    of a queryset. Fields of related models are separated with `__`, as in
+    lookups.
+    """
+
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+
+    opts = queryset.model._meta
+    *relations, name = name.split("__")
+    for relation in relations:
+        opts = opts.get_field(relation).related_model._meta
+
+    return opts.pk if name == "pk" else opts.get_field(name)
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    JSON encoder for cursor positions. Unlike DjangoJSONEncoder, datetimes
+    and times keep their microseconds, so that a position matches the row
+    it was read from exactly.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def get_keyset_filter(keyset, position):
+    """
+    Returns a Q object which matches the rows after `position` in the
+    keyset ordering. NULL is treated as smaller than any value, as in MySQL
+    and SQLite: it comes first in ascending and last in descending order.
+
+    For an ordering `(a, b, id)` this is
+    `a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)`.
+    """
+
+    condition = Q()
+    equal = Q()
+
+    for (field, descending), value in zip(keyset, position):
+        if value is None:
+            after = None if descending else Q(**{f"{field}__isnull": False})
+            same = Q(**{f"{field}__isnull": True})
+        elif descending:
+            after = Q(**{f"{field}__lt": value}) | Q(
+                **{f"{field}__isnull": True}
+            )
+            same = Q(**{field: value})
+        else:
+            after = Q(**{f"{field}__gt": value})
+            same = Q(**{field: value})
+
+        if after is not None:
+            condition |= equal & after
+        equal &= same
+
+    return condition
+
+
+class KeysetPagination(CachedCountPagination):
+    """
+    Pagination class which keeps page number pagination by default, see
+    CachedCountPagination, and switches to keyset (cursor) pagination when
+    the `cursor` query param is passed. Pass an empty `cursor` for the
+    first page, and follow the `next` link for the following pages.
+
+    Keyset pages are read with a `WHERE` on the position of the last row of
+    the previous page, instead of an `OFFSET`, and do not include a total
+    count. With an index on the queryset ordering, every page takes the
+    same time to read at any depth. The ordering is extended with the
+    primary key, so that it is stable.
+    """
+
+    cursor_query_param = "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_mode = self.cursor_query_param in request.query_params
+        if not self.keyset_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        keyset = get_keyset_ordering(queryset)
+        queryset = queryset.order_by(
+            *[f"-{field}" if desc else field for field, desc in keyset]
+        )
+
+        position = self.decode_cursor(request, queryset, keyset)
+        if position is not None:
+            queryset = queryset.filter(get_keyset_filter(keyset, position))
+
+        rows = list(queryset[: page_size + 1])
+        page = rows[:page_size]
+
+        self.next_position = None
+        if len(rows) > page_size:
+            self.next_position = [
+                get_row_value(page[-1], field) for field, _ in keyset
+            ]
+
+        return page
+
+    def decode_cursor(self, request, queryset, keyset):
+        """
+        Returns the position encoded in the cursor param, with each value
+        converted to the type of its ordering field, or None for the first
+        page. Raises NotFound if the cursor is malformed.
+        """
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound("Invalid cursor")
+
+        if not isinstance(position, list) or len(position) != len(keyset):
+            raise NotFound("Invalid cursor")
+
+        try:
+            return [
+                get_ordering_field(queryset, field).to_python(value)
+                for (field, _), value in zip(keyset, position)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound("Invalid cursor")
+
+    def encode_cursor(self, position):
+        data = json.dumps(position, cls=CursorEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def get_next_link(self):
+        if not self.keyset_mode:
+            return super().get_next_link()
+
+        if self.next_position is None:
+            return None
+
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        if not self.keyset_mode:
+            return super().get_paginated_response(data)
+
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("results", data)])
+        )
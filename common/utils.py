@@ -1,9 +1,12 @@
+import re
+import unicodedata
+
 from django.db import models
 from rest_framework import serializers
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 
 MAX_STRING_LENGTH = 255
-YEAR_LENGTH = 4
 
 REQUIRED_FIELDS_ERRORS = [
     "This field may not be blank.",
@@ -40,6 +43,83 @@ class SimpleNameModel(models.Model):
         abstract = True
 
 
+class NormalizedNameModel(models.Model):
+    """
+    Abstract model for models with a `name` which is searched regardless of
+    case, accents and punctuation. `normalized_name` stores the
+    normalize_name form of `name`, and is updated on every save, so that
+    name searches can use an index on it.
+    """
+
+    normalized_name = models.CharField(
+        max_length=MAX_STRING_LENGTH, default="", editable=False
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)[:MAX_STRING_LENGTH]
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "normalized_name"}
+
+        super().save(*args, **kwargs)
+
+
+class BitFlagNameModel(SimpleNameModel):
+    """
+    Abstract model for SimpleNameModels which are stored as a bitmask on
+    related objects. Each instance is assigned a unique `bit` below
+    `max_bits` when it is first saved.
+    """
+
+    max_bits = 32
+
+    bit = models.PositiveSmallIntegerField(
+        unique=True, null=True, editable=False
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            used_bits = set(
+                type(self)
+                .objects.exclude(bit=None)
+                .values_list("bit", flat=True)
+            )
+            free_bits = [
+                bit for bit in range(self.max_bits) if bit not in used_bits
+            ]
+
+            if not free_bits:
+                raise ValueError(f"No free bit for {type(self).__name__}")
+            self.bit = free_bits[0]
+
+        super().save(*args, **kwargs)
+
+    @property
+    def flag(self):
+        return 1 << self.bit
+
+    @classmethod
+    def get_mask(cls, names):
+        """
+        Returns the bitmask of the instances with the given names, and
+        whether every name exists.
+        """
+
+        bits = cls.objects.filter(name__in=names).values_list("bit", flat=True)
+        mask = 0
+        for bit in bits:
+            mask |= 1 << bit
+
+        return mask, len(bits) == len(set(names))
+
+
 class SimpleNameSerializer(serializers.Serializer):
     """
     Reusable serializer for serializing only the `name` attribute.
@@ -71,6 +151,73 @@ def get_first_serializer_error(errors):
     return message
 
 
+def get_integer_param(name, value):
+    """
+    Converts a query param to an integer. Raises ParseError, which returns
+    an `HTTP 400 Bad Request` response, if the value is not an integer.
+    """
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ParseError(f"`{name}` must be an integer")
+
+
+def get_integer_list_param(name, value):
+    """
+    Converts a comma separated query param to a list of integers, see
+    get_integer_param. Returns an empty list if the value is empty.
+    """
+
+    if not value:
+        return []
+
+    return [get_integer_param(name, item) for item in value.split(",")]
+
+
+def get_model_fields(serializer_class):
+    """
+    Returns the names of the model fields read by a ModelSerializer, for
+    selecting only the serialized columns with only(). Declared fields are
+    read from their `source`, e.g. several fields may read the same image.
+    """
+
+    declared = serializer_class._declared_fields
+    fields = [
+        getattr(declared.get(name), "source", None) or name
+        for name in serializer_class.Meta.fields
+    ]
+
+    return list(dict.fromkeys(fields))
+
+
+def get_related_fields(relation, serializer_class):
+    """
+    Returns the lookups of the fields of a serializer on a related model,
+    for selecting only the serialized columns with only().
+    """
+
+    return [
+        f"{relation}__{field}" for field in get_model_fields(serializer_class)
+    ]
+
+
+def normalize_name(name):
+    """
+    Returns the normalized form of a name, for matching names regardless of
+    case, accents and punctuation. The name is casefolded, accents are
+    stripped, and any run of punctuation or whitespace becomes a single
+    space e.g. `Amélie (2001)` becomes `amelie 2001`.
+    """
+
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    stripped = "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+
+    return " ".join(re.findall(r"[^\W_]+", stripped))
+
+
 def response_http(message, status):
     """
     Takes a message and an HTTP status code, and returns an HTTP response
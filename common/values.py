@@ -0,0 +1,144 @@
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Serializer fields whose representation of a database value of a matching
+# model field is the value itself, e.g. `int(value)` of an integer
+IDENTITY_FIELDS = {
+    serializers.IntegerField: (models.IntegerField, models.AutoField),
+    serializers.CharField: (models.CharField, models.TextField),
+    serializers.BooleanField: (models.BooleanField,),
+}
+
+
+class ValuesSerializer:
+    """
+    Serializer for lists of rows read with values(), compiled from a
+    ModelSerializer class whose fields are all model fields e.g.
+    BasicTitleSerializer. Returns the same data as the ModelSerializer,
+    without instantiating models: each value is passed to the
+    to_representation of the same serializer field, or copied if that
+    would return the value itself, see IDENTITY_FIELDS.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.fields = []
+
+        model = serializer_class.Meta.model
+        for name, field in serializer_class().fields.items():
+            model_field = model._meta.get_field(field.source)
+            if model_field.is_relation or isinstance(
+                field, serializers.BaseSerializer
+            ):
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{name} is not a model field"
+                )
+            self.fields.append((name, model_field.attname, model_field))
+
+        self.columns = list(
+            dict.fromkeys(column for _, column, _ in self.fields)
+        )
+
+    def values(self, queryset):
+        """
+        Returns the queryset's rows as dictionaries of the serialized
+        columns, and of the ordering fields, which keyset pagination reads.
+        """
+
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        names = [
+            name.lstrip("-")
+            for name in ordering
+            if isinstance(name, str) and name != "?"
+        ]
+
+        return queryset.values(*dict.fromkeys([*self.columns, *names]))
+
+    def get_converter(self, field, model_field):
+        if isinstance(model_field, models.FileField):
+
+            def convert(value):
+                file = model_field.attr_class(None, model_field, value)
+                return field.to_representation(file)
+
+            return convert
+
+        if isinstance(model_field, IDENTITY_FIELDS.get(type(field), ())):
+            return None
+
+        return field.to_representation
+
+    def serialize(self, rows, context=None, fields=None):
+        """
+        Serializes rows read with `values`.
+
+        Args:
+            rows: iterable of dictionaries
+            context: serializer context, e.g. with the request for URLs
+            fields: names of the serialized fields, or None for every field
+
+        Returns:
+            data: list of dictionaries
+        """
+
+        serializer = self.serializer_class(context=context or {})
+        converters = [
+            (name, column, self.get_converter(serializer.fields[name], field))
+            for name, column, field in self.fields
+            if fields is None or name in fields
+        ]
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert in converters:
+                value = row[column]
+                if value is not None and convert is not None:
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+
+        return data
+
+
+@lru_cache(maxsize=None)
+def get_values_serializer(serializer_class):
+    """
+    Returns the ValuesSerializer of a serializer class, compiled once.
+    """
+
+    return ValuesSerializer(serializer_class)
+
+
+class ValuesListMixin:
+    """
+    Mixin for list views with a serializer class which ValuesSerializer can
+    compile, which reads rows with values() and serializes them with
+    ValuesSerializer. Sparse fieldsets (`serialized_fields`, see
+    SparseFieldsetsMixin) are applied to the serialized rows.
+    """
+
+    def get_values_serializer(self):
+        return get_values_serializer(self.get_serializer_class())
+
+    def serialize_rows(self, rows):
+        return self.get_values_serializer().serialize(
+            rows,
+            self.get_serializer_context(),
+            getattr(self, "serialized_fields", None),
+        )
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_values_serializer().values(
+            self.filter_queryset(self.get_queryset())
+        )
+
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.serialize_rows(queryset))
+
+        return self.get_paginated_response(self.serialize_rows(page))
@@ -0,0 +1,686 @@
+import heapq
+import logging
+import math
+import mmap
+import os
+import pickle
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from collections import Counter
+from contextlib import ExitStack
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import Count
+
+from common.utils import normalize_name
+
+from .models import Person, Title
+
+logger = logging.getLogger(__name__)
+
+# The index is a single read-only file, which every worker memory-maps so
+# that the pages are shared between processes. Its layout is:
+#
+#   header
+#   entries       one ENTRY per name, sorted by normalized name
+#   prefixes      one PREFIX per popular prefix, sorted by prefix
+#   top lists     uint32 entry indexes, ranked by popularity
+#   trigrams      one TRIGRAM per kind and trigram, sorted by key
+#   postings      uint32 entry indexes, sorted, one list per trigram
+#   strings       UTF-8 normalized names, display names, prefixes and
+#                 trigram keys
+#
+# Suggestions for a prefix are the entries in its range of the sorted
+# names. Ranges larger than SCAN_LIMIT are too slow to rank per request,
+# so the top entries of every such prefix are precomputed at build time.
+#
+# Fuzzy matches are found through the trigram posting lists. A trigram
+# key is the entry kind byte followed by the UTF-8 trigram, so titles and
+# people have separate lists.
+MAGIC = b"IMDBAC02"
+HEADER = struct.Struct("<8sIIQQQIQQ")
+ENTRY = struct.Struct("<QHQHQIHB")
+PREFIX = struct.Struct("<QHQH")
+TOP_LIST_ITEM = struct.Struct("<I")
+TRIGRAM = struct.Struct("<QHQI")
+POSTING = struct.Struct("<I")
+
+SCAN_LIMIT = 2000
+MAX_SUGGESTIONS = 20
+BUILD_CHUNK_SIZE = 10000
+
+# The index is built in runs of at most BUILD_RUN_SIZE names or postings,
+# which are sorted in memory and merged from temporary files, at most
+# BUILD_MERGE_WIDTH files at a time.
+BUILD_RUN_SIZE = 100000
+BUILD_MERGE_WIDTH = 64
+
+# A fuzzy search reads the posting lists of the rarest query trigrams
+# first, and stops once FUZZY_POSTINGS_LIMIT postings have been read, so
+# very common trigrams never make a query slow. The FUZZY_CANDIDATES
+# entries sharing the most trigrams are then ranked by similarity.
+FUZZY_POSTINGS_LIMIT = 100000
+FUZZY_CANDIDATES = 200
+FUZZY_MIN_SIMILARITY = 0.3
+MAX_FUZZY_MATCHES = 100
+
+KINDS = ["title", "person"]
+TITLE, PERSON = range(len(KINDS))
+
+
+class AutocompleteIndex:
+    """
+    Read-only view of an autocomplete index file. Looks up suggestions for
+    a normalized prefix using binary search over the memory-mapped file,
+    without any database queries.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.stat = get_file_stat(file.fileno())
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic,
+            self.count,
+            self.prefix_count,
+            self.prefixes_offset,
+            self.lists_offset,
+            self.trigram_count,
+            self.trigrams_offset,
+            self.postings_offset,
+            self.strings_offset,
+        ) = HEADER.unpack_from(self.buffer)
+
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an autocomplete index")
+
+    def read_string(self, offset, length):
+        start = self.strings_offset + offset
+        return self.buffer[start : start + length]
+
+    def read_entry(self, index):
+        return ENTRY.unpack_from(self.buffer, HEADER.size + index * ENTRY.size)
+
+    def read_key(self, index):
+        key_offset, key_length, *_ = self.read_entry(index)
+        return self.read_string(key_offset, key_length)
+
+    def lower_bound(self, key):
+        """
+        Returns the index of the first entry whose name is not less than key.
+        """
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.read_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def find_top_list(self, prefix):
+        """
+        Returns the precomputed top entry indexes of a prefix, or None if the
+        prefix range is small enough to be ranked per request.
+        """
+
+        low, high = 0, self.prefix_count
+        while low < high:
+            middle = (low + high) // 2
+            offset = self.prefixes_offset + middle * PREFIX.size
+            (
+                prefix_offset,
+                prefix_length,
+                list_offset,
+                list_length,
+            ) = PREFIX.unpack_from(self.buffer, offset)
+            current = self.read_string(prefix_offset, prefix_length)
+
+            if current == prefix:
+                start = self.lists_offset + list_offset * TOP_LIST_ITEM.size
+                return [
+                    TOP_LIST_ITEM.unpack_from(
+                        self.buffer, start + item * TOP_LIST_ITEM.size
+                    )[0]
+                    for item in range(list_length)
+                ]
+            if current < prefix:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+    def suggest(self, query, limit=10):
+        """
+        Returns up to `limit` suggestions whose normalized name starts with
+        the normalized query, ranked by popularity.
+
+        Args:
+            query: string typed by the user
+            limit: maximum number of suggestions, at most MAX_SUGGESTIONS
+
+        Returns:
+            suggestions: list of dictionaries with `type`, `id`, `name` and
+            `year` keys
+        """
+
+        prefix = normalize_name(query).encode()
+        if not prefix:
+            return []
+
+        limit = min(limit, MAX_SUGGESTIONS)
+        indexes = self.find_top_list(prefix)
+
+        if indexes is None:
+            # 0xff never occurs in UTF-8, so it sorts after every name
+            # which starts with the prefix.
+            start = self.lower_bound(prefix)
+            end = self.lower_bound(prefix + b"\xff")
+            indexes = heapq.nlargest(
+                limit,
+                range(start, end),
+                key=lambda index: self.read_entry(index)[5],
+            )
+
+        suggestions = []
+        for index in indexes[:limit]:
+            (
+                _,
+                _,
+                name_offset,
+                name_length,
+                object_id,
+                _,
+                year,
+                kind,
+            ) = self.read_entry(index)
+            suggestions.append(
+                {
+                    "type": KINDS[kind],
+                    "id": object_id,
+                    "name": self.read_string(
+                        name_offset, name_length
+                    ).decode(),
+                    "year": year or None,
+                }
+            )
+
+        return suggestions
+
+    def find_postings(self, key):
+        """
+        Returns the offset and length of the posting list of a trigram key,
+        or None if no name has the trigram.
+        """
+
+        low, high = 0, self.trigram_count
+        while low < high:
+            middle = (low + high) // 2
+            offset = self.trigrams_offset + middle * TRIGRAM.size
+            (
+                key_offset,
+                key_length,
+                list_offset,
+                list_length,
+            ) = TRIGRAM.unpack_from(self.buffer, offset)
+            current = self.read_string(key_offset, key_length)
+
+            if current == key:
+                return list_offset, list_length
+            if current < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return None
+
+    def read_postings(self, list_offset, list_length):
+        start = self.postings_offset + list_offset * POSTING.size
+        postings = array("I")
+        postings.frombytes(
+            self.buffer[start : start + list_length * POSTING.size]
+        )
+        if sys.byteorder == "big":
+            postings.byteswap()
+        return postings
+
+    def fuzzy_search(self, query, kind, limit=MAX_FUZZY_MATCHES):
+        """
+        Returns the entries of a kind whose normalized name is most similar
+        to the normalized query, for queries with typos. Similarity is the
+        number of shared trigrams divided by the number of distinct
+        trigrams of both names, and matches are ranked by similarity
+        weighted with popularity.
+
+        Args:
+            query: string containing the search query
+            kind: TITLE or PERSON
+            limit: maximum number of matches
+
+        Returns:
+            matches: list of `(id, similarity)` tuples, best match first
+        """
+
+        query_trigrams = get_trigrams(normalize_name(query))
+        if not query_trigrams:
+            return []
+
+        lists = []
+        for trigram in query_trigrams:
+            found = self.find_postings(bytes([kind]) + trigram)
+            if found is not None:
+                lists.append(found)
+        lists.sort(key=lambda found: found[1])
+
+        hits = Counter()
+        read = 0
+        for list_offset, list_length in lists:
+            if read and read + list_length > FUZZY_POSTINGS_LIMIT:
+                break
+            hits.update(self.read_postings(list_offset, list_length))
+            read += list_length
+
+        matches = []
+        for index, _ in hits.most_common(FUZZY_CANDIDATES):
+            trigrams = get_trigrams(self.read_key(index).decode())
+            shared = len(trigrams & query_trigrams)
+            similarity = shared / len(trigrams | query_trigrams)
+            if similarity < FUZZY_MIN_SIMILARITY:
+                continue
+
+            _, _, _, _, object_id, popularity, _, _ = self.read_entry(index)
+            score = similarity * (1 + math.log1p(popularity) / 20)
+            matches.append((score, object_id, similarity))
+
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return [
+            (object_id, similarity)
+            for _, object_id, similarity in matches[:limit]
+        ]
+
+
+def get_trigrams(name):
+    """
+    Returns the set of UTF-8 trigrams of a normalized name. Every word is
+    padded with two spaces in front and one at the end, so that short words
+    and word starts have trigrams of their own.
+    """
+
+    trigrams = set()
+    for word in name.split():
+        padded = f"  {word} "
+        for start in range(len(padded) - 2):
+            trigrams.add(padded[start : start + 3].encode())
+
+    return trigrams
+
+
+def get_file_stat(file):
+    """
+    Returns the values which change when the index file is replaced.
+    """
+
+    stat = os.stat(file)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_autocomplete_index():
+    """
+    Returns the AutocompleteIndex of settings.AUTOCOMPLETE_INDEX_PATH, or
+    None if the index has not been built. A new build replaces the file
+    atomically, and is picked up by the next call in every worker.
+    """
+
+    global _index
+    path = settings.AUTOCOMPLETE_INDEX_PATH
+
+    try:
+        stat = get_file_stat(path)
+    except FileNotFoundError:
+        return None
+
+    if _index is None or _index.stat != stat:
+        with _index_lock:
+            if _index is None or _index.stat != stat:
+                _index = AutocompleteIndex(path)
+                logger.info("Loaded autocomplete index %s", path)
+
+    return _index
+
+
+def parse_year(year):
+    try:
+        return int(year or 0)
+    except ValueError:
+        return 0
+
+
+def get_autocomplete_entries():
+    """
+    Yields a `(kind, id, name, year, popularity)` tuple for every Title and
+    Person. Titles are ranked by their popularity, and people by the
+    number of titles they have worked on.
+    """
+
+    titles = Title.objects.values_list(
+        "id", "name", "start_year", "popularity"
+    ).order_by()
+    for title_id, name, year, popularity in titles.iterator(BUILD_CHUNK_SIZE):
+        yield TITLE, title_id, name, parse_year(year), popularity
+
+    people = (
+        Person.objects.annotate(popularity=Count("filmography"))
+        .values_list("id", "name", "birth_year", "popularity")
+        .order_by()
+    )
+    for person_id, name, year, popularity in people.iterator(BUILD_CHUNK_SIZE):
+        yield PERSON, person_id, name, parse_year(year), popularity
+
+
+def get_row_order(row):
+    key, _, _, _, _, popularity = row
+    return key, -popularity
+
+
+def write_run(directory, items):
+    """
+    Writes sorted items to a temporary file in `directory`, in pickled
+    chunks of BUILD_CHUNK_SIZE items. Returns the path of the file, see
+    read_run.
+    """
+
+    items = iter(items)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as file:
+        while True:
+            chunk = list(islice(items, BUILD_CHUNK_SIZE))
+            if not chunk:
+                break
+            pickle.dump(chunk, file, pickle.HIGHEST_PROTOCOL)
+
+    return file.name
+
+
+def read_run(path):
+    """
+    Yields the items of a file written by write_run, in order.
+    """
+
+    with open(path, "rb") as file:
+        while True:
+            try:
+                yield from pickle.load(file)
+            except EOFError:
+                return
+
+
+def merge_runs(directory, paths, key):
+    """
+    Returns an iterator over the items of several files written by
+    write_run, in order. Equal items keep the order of their files. At most
+    BUILD_MERGE_WIDTH files are open at once, so more files are merged into
+    fewer first.
+    """
+
+    while len(paths) > BUILD_MERGE_WIDTH:
+        merged = []
+        for start in range(0, len(paths), BUILD_MERGE_WIDTH):
+            group = paths[start : start + BUILD_MERGE_WIDTH]
+            merged.append(
+                write_run(directory, merge_runs(directory, group, key))
+            )
+            for path in group:
+                os.remove(path)
+        paths = merged
+
+    return heapq.merge(*(read_run(path) for path in paths), key=key)
+
+
+class PrefixRanker:
+    """
+    Finds every prefix of a stream of sorted keys whose range is larger than
+    SCAN_LIMIT, and ranks the top MAX_SUGGESTIONS entries of each. Only the
+    prefixes of the current key are open, each with a bounded heap of its
+    top entries, so memory does not grow with the number of keys.
+    """
+
+    def __init__(self):
+        self.key = ""
+        self.open = []
+        self.prefixes = {}
+
+    def close(self, length, end):
+        while len(self.open) > length:
+            start, heap = self.open.pop()
+            if end - start > SCAN_LIMIT:
+                prefix = self.key[: len(self.open) + 1]
+                self.prefixes[prefix.encode()] = [
+                    -index for _, index in sorted(heap, reverse=True)
+                ]
+
+    def add(self, index, key, popularity):
+        self.close(len(os.path.commonprefix([self.key, key])), index)
+        self.key = key
+        self.open.extend((index, []) for _ in range(len(self.open), len(key)))
+
+        # Ties are ranked by index, so that earlier entries win
+        item = (popularity, -index)
+        for _, heap in self.open:
+            if len(heap) < MAX_SUGGESTIONS:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    def finish(self, end):
+        """
+        Returns the popular prefixes, as a sorted list of tuples of prefix
+        bytes and ranked entry indexes.
+        """
+
+        self.close(0, end)
+        return sorted(self.prefixes.items())
+
+
+class Section:
+    """
+    Temporary file holding one section of an index which is being built.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.size = 0
+
+    def write(self, data):
+        """
+        Appends data to the section, and returns its offset.
+        """
+
+        self.file.write(data)
+        self.size += len(data)
+        return self.size - len(data)
+
+    def copy_to(self, file):
+        self.file.seek(0)
+        shutil.copyfileobj(self.file, file)
+
+
+def write_autocomplete_index(path, entries):
+    """
+    Writes an autocomplete index file for the given entries. The file is
+    written next to `path` and then renamed over it, so readers never see
+    a partially written index.
+
+    Memory use is bounded by BUILD_RUN_SIZE instead of the number of
+    entries. Entries are sorted in runs which are merged from temporary
+    files, and posting lists are written to temporary files in runs as
+    well, which are merged by trigram. Temporary files are kept next to
+    `path`, and every section of the index is written to a temporary file
+    before the sections are joined.
+
+    Args:
+        path: path of the index file
+        entries: iterable of `(kind, id, name, year, popularity)` tuples
+
+    Returns:
+        count: number of entries in the index
+    """
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    with ExitStack() as stack:
+        work = stack.enter_context(tempfile.TemporaryDirectory(dir=directory))
+        entry_table, trigram_table, posting_lists, strings = [
+            Section(stack.enter_context(tempfile.TemporaryFile(dir=work)))
+            for _ in range(4)
+        ]
+
+        def add_string(value):
+            return strings.write(value), len(value)
+
+        rows = []
+        row_runs = []
+        for kind, object_id, name, year, popularity in entries:
+            key = normalize_name(name)
+            if not key:
+                continue
+
+            rows.append((key, name, kind, object_id, year, popularity))
+            if len(rows) == BUILD_RUN_SIZE:
+                rows.sort(key=get_row_order)
+                row_runs.append(write_run(work, rows))
+                rows = []
+        rows.sort(key=get_row_order)
+        row_runs.append(write_run(work, rows))
+        del rows
+
+        # Entries are added in index order, so every posting list is sorted
+        count = 0
+        ranker = PrefixRanker()
+        postings = {}
+        posting_count = 0
+        posting_runs = []
+        for index, row in enumerate(merge_runs(work, row_runs, get_row_order)):
+            key, name, kind, object_id, year, rank = row
+            ranker.add(index, key, rank)
+
+            key_offset, key_length = add_string(key.encode())
+            name_offset, name_length = add_string(name.encode()[:0xFFFF])
+            entry_table.write(
+                ENTRY.pack(
+                    key_offset,
+                    key_length,
+                    name_offset,
+                    name_length,
+                    object_id,
+                    min(rank, 0xFFFFFFFF),
+                    min(year, 0xFFFF),
+                    kind,
+                )
+            )
+            count = index + 1
+
+            kind = bytes([kind])
+            for trigram in get_trigrams(key):
+                postings.setdefault(kind + trigram, array("I")).append(index)
+                posting_count += 1
+
+            if posting_count >= BUILD_RUN_SIZE:
+                posting_runs.append(write_run(work, sorted(postings.items())))
+                postings = {}
+                posting_count = 0
+        posting_runs.append(write_run(work, sorted(postings.items())))
+        del postings
+
+        prefixes = ranker.finish(count)
+        prefix_table = bytearray()
+        top_lists = bytearray()
+        for prefix, indexes in prefixes:
+            prefix_offset, prefix_length = add_string(prefix)
+            prefix_table += PREFIX.pack(
+                prefix_offset,
+                prefix_length,
+                len(top_lists) // TOP_LIST_ITEM.size,
+                len(indexes),
+            )
+            for index in indexes:
+                top_lists += TOP_LIST_ITEM.pack(index)
+
+        # Runs hold consecutive entries, so joining the lists of a trigram
+        # in run order keeps it sorted
+        trigram_count = 0
+        merged = merge_runs(work, posting_runs, itemgetter(0))
+        for key, lists in groupby(merged, key=itemgetter(0)):
+            indexes = array("I")
+            for _, run_indexes in lists:
+                indexes.extend(run_indexes)
+            if sys.byteorder == "big":
+                indexes.byteswap()
+
+            key_offset, key_length = add_string(key)
+            trigram_table.write(
+                TRIGRAM.pack(
+                    key_offset,
+                    key_length,
+                    posting_lists.size // POSTING.size,
+                    len(indexes),
+                )
+            )
+            posting_lists.write(indexes.tobytes())
+            trigram_count += 1
+
+        prefixes_offset = HEADER.size + entry_table.size
+        lists_offset = prefixes_offset + len(prefix_table)
+        trigrams_offset = lists_offset + len(top_lists)
+        postings_offset = trigrams_offset + trigram_table.size
+        strings_offset = postings_offset + posting_lists.size
+        header = HEADER.pack(
+            MAGIC,
+            count,
+            len(prefixes),
+            prefixes_offset,
+            lists_offset,
+            trigram_count,
+            trigrams_offset,
+            postings_offset,
+            strings_offset,
+        )
+
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as file:
+            file.write(header)
+            entry_table.copy_to(file)
+            file.write(prefix_table)
+            file.write(top_lists)
+            trigram_table.copy_to(file)
+            posting_lists.copy_to(file)
+            strings.copy_to(file)
+
+    os.chmod(file.name, 0o644)
+    os.replace(file.name, path)
+    return count
+
+
+def build_autocomplete_index():
+    """
+    Builds the autocomplete index at settings.AUTOCOMPLETE_INDEX_PATH from
+    every Title and Person in the database.
+    """
+
+    count = write_autocomplete_index(
+        settings.AUTOCOMPLETE_INDEX_PATH, get_autocomplete_entries()
+    )
+    logger.info("Built autocomplete index with %s names", count)
+    return count
@@ -0,0 +1,284 @@
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import quote_etag
+
+# Version of every cached search result list. Bumped when the catalog
+# changes, which makes all cached lists stale at once.
+SEARCH_VERSION = "search"
+
+# Version of the cached search result lists which filter or sort by rating
+# or rating count. Bumped when rating aggregates change, since these add
+# titles to, drop titles from and reorder such lists. Popularity changes
+# do not bump any version, so lists sorted by popularity are reordered
+# when they expire.
+RATING_VERSION = "rating"
+
+# Version of every cached detail response. Bumped once per ingested file,
+# instead of once per ingested row.
+CATALOG_VERSION = "catalog"
+
+# A cache miss of a detail response is rebuilt by a single request, which
+# holds a lock for at most BUILD_LOCK_TIMEOUT seconds. Other requests for
+# the same response poll the cache every BUILD_POLL_INTERVAL seconds until
+# it is built, instead of running the same queries.
+BUILD_LOCK_TIMEOUT = 10
+BUILD_POLL_INTERVAL = 0.05
+
+_catalog_update = threading.local()
+
+
+def get_version(name):
+    """
+    Returns the current version of a group of cached values. Values cached
+    under an older version are never read again, and expire with their
+    timeout.
+
+    Versions are the time of the latest change in nanoseconds. If a version
+    has been evicted from the cache, a new one is started from the current
+    time, so that it can not match an older version.
+    """
+
+    key = f"version:{name}"
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def get_versions(names):
+    """
+    Returns a dictionary of the current versions of several groups, read
+    from the cache at once.
+    """
+
+    keys = {name: f"version:{name}" for name in names}
+    found = cache.get_many(keys.values())
+
+    return {
+        name: found[key] if key in found else get_version(name)
+        for name, key in keys.items()
+    }
+
+
+def bump_version(name):
+    """
+    Invalidates every value cached under the current version of a group.
+    """
+
+    cache.set(f"version:{name}", time.time_ns(), None)
+
+
+def get_object_version_name(kind, pk):
+    return f"{kind}:{pk}"
+
+
+def in_catalog_update():
+    """
+    Returns whether the current thread is inside a catalog update, see
+    catalog_update.
+    """
+
+    return getattr(_catalog_update, "active", False)
+
+
+def invalidate_objects(kind, pks):
+    """
+    Bumps the versions of the given objects, which invalidates their cached
+    detail responses. Does nothing during a catalog update, which
+    invalidates every object at once when it ends.
+
+    Args:
+        kind: string kind of the objects e.g. `title` or `person`
+        pks: iterable of primary keys
+    """
+
+    if in_catalog_update():
+        return
+
+    version = time.time_ns()
+    cache.set_many(
+        {
+            f"version:{get_object_version_name(kind, pk)}": version
+            for pk in pks
+        },
+        None,
+    )
+
+
+@contextmanager
+def catalog_update():
+    """
+    Context manager for bulk changes to the catalog, e.g. ingestion of a
+    file. Per-object invalidation is suppressed inside the block, and the
+    catalog and search versions are bumped once when it ends. The genre and
+    profession bitmask signals are skipped as well, since ingested objects
+    are created with their bitmasks.
+    """
+
+    _catalog_update.active = True
+    try:
+        yield
+    finally:
+        _catalog_update.active = False
+        bump_version(CATALOG_VERSION)
+        bump_version(SEARCH_VERSION)
+
+
+def get_or_build(key, build, timeout):
+    """
+    Returns the cached value of a key, or builds and caches it. While one
+    caller builds a missing value, concurrent callers wait for it for up to
+    BUILD_LOCK_TIMEOUT seconds, and then build it themselves.
+
+    Args:
+        key: string cache key
+        build: function which returns the value
+        timeout: number of seconds to cache the value for
+
+    Returns:
+        value: cached or built value
+    """
+
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock = f"lock:{key}"
+    if cache.add(lock, True, BUILD_LOCK_TIMEOUT):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock)
+        return value
+
+    deadline = time.monotonic() + BUILD_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(BUILD_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+    value = build()
+    cache.set(key, value, timeout)
+    return value
+
+
+def get_cached_detail(kind, pk, origin, build):
+    """
+    Returns the serialized data of an object's detail response, from the
+    cache if neither the object nor the catalog has changed since it was
+    cached. The data is cached for DETAIL_CACHE_TIMEOUT seconds.
+
+    Args:
+        kind: string kind of the object e.g. `title` or `person`
+        pk: primary key of the object
+        origin: scheme and host of the request, see get_request_origin
+        build: function which returns the serialized data
+
+    Returns:
+        data: serialized data of the object
+    """
+
+    object_version = get_object_version_name(kind, pk)
+    versions = get_versions([CATALOG_VERSION, object_version])
+    key = get_detail_key(
+        kind, pk, origin, versions[CATALOG_VERSION], versions[object_version]
+    )
+
+    return get_or_build(key, build, settings.DETAIL_CACHE_TIMEOUT)
+
+
+def get_request_origin(request):
+    """
+    Returns a short digest of the scheme and host of a request. Serialized
+    data holds absolute media URLs built for the request, so it is cached
+    per origin.
+    """
+
+    origin = request.build_absolute_uri("/")
+    return hashlib.md5(origin.encode()).hexdigest()[:12]
+
+
+def get_detail_key(kind, pk, origin, catalog_version, object_version):
+    return f"detail:{kind}:{pk}:{origin}:{catalog_version}:{object_version}"
+
+
+def get_cached_details(kind, pks, origin):
+    """
+    Returns the serialized data of the detail responses of several objects
+    which are in the cache, read from the cache at once. Objects which are
+    not cached are left out, and are not built.
+
+    Args:
+        kind: string kind of the objects e.g. `title` or `person`
+        pks: iterable of primary keys
+        origin: scheme and host of the request, see get_request_origin
+
+    Returns:
+        details: dictionary of serialized data by primary key
+    """
+
+    names = {pk: f"version:{get_object_version_name(kind, pk)}" for pk in pks}
+    versions = cache.get_many([f"version:{CATALOG_VERSION}", *names.values()])
+
+    catalog_version = versions.get(f"version:{CATALOG_VERSION}")
+    if catalog_version is None:
+        return {}
+
+    # An object without a version has not been cached since it was evicted
+    keys = {
+        get_detail_key(kind, pk, origin, catalog_version, versions[name]): pk
+        for pk, name in names.items()
+        if name in versions
+    }
+    found = cache.get_many(keys.keys())
+
+    return {keys[key]: data for key, data in found.items()}
+
+
+def get_detail_validators(queryset, kind, pk, variant=""):
+    """
+    Returns the ETag and last modification time of an object's detail
+    response, without serializing it. Both are computed from the object's
+    `updated_at` and the versions of the object and the catalog, which are
+    bumped by changes which do not save the object e.g. rating updates.
+
+    Args:
+        queryset: queryset of the object's model
+        kind: string kind of the object e.g. `title` or `person`
+        pk: primary key of the object
+        variant: string which identifies the representation of the object
+        e.g. its serialized fields, if there are several
+
+    Returns:
+        validators: tuple of the quoted ETag and an aware datetime, or None
+        if the object does not exist
+    """
+
+    updated_at = (
+        queryset.filter(pk=pk).values_list("updated_at", flat=True).first()
+    )
+    if updated_at is None:
+        return None
+
+    object_version = get_object_version_name(kind, pk)
+    versions = get_versions([CATALOG_VERSION, object_version])
+    version_time = datetime.fromtimestamp(
+        max(versions.values()) / 1e9, tz=timezone.utc
+    )
+
+    tag = f"{kind}:{pk}:{updated_at.isoformat()}:{versions[CATALOG_VERSION]}"
+    tag = f"{tag}:{versions[object_version]}:{variant}"
+    etag = quote_etag(hashlib.md5(tag.encode()).hexdigest())
+
+    return etag, max(updated_at, version_time)
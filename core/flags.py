@@ -0,0 +1,92 @@
+from django.db import models
+
+# Number of objects whose bitmasks are recalculated per query, see
+# update_flag_masks
+FLAG_MASKS_BATCH_SIZE = 500
+
+
+def get_flag_relation(model, relation):
+    """
+    Returns the through model of a many-to-many relation to a
+    BitFlagNameModel, and the names of its foreign keys to the model and to
+    the flags.
+    """
+
+    field = model._meta.get_field(relation)
+    return (
+        field.remote_field.through,
+        field.m2m_field_name(),
+        field.m2m_reverse_field_name(),
+    )
+
+
+def update_flag_masks(model, field, relation, pks):
+    """
+    Recalculates the bitmask `field` of the given objects from their
+    many-to-many `relation` to a BitFlagNameModel, e.g. Title.genre_mask
+    from Title.genres, with one query and one bulk update per batch of
+    FLAG_MASKS_BATCH_SIZE objects.
+    """
+
+    pks = list(set(pks))
+    through, source, target = get_flag_relation(model, relation)
+
+    for start in range(0, len(pks), FLAG_MASKS_BATCH_SIZE):
+        batch = pks[start : start + FLAG_MASKS_BATCH_SIZE]
+        masks = dict.fromkeys(batch, 0)
+
+        bits = through.objects.filter(**{f"{source}__in": batch}).values_list(
+            source, f"{target}__bit"
+        )
+        for pk, bit in bits:
+            masks[pk] |= 1 << bit
+
+        model.objects.bulk_update(
+            [model(pk=pk, **{field: mask}) for pk, mask in masks.items()],
+            [field],
+        )
+
+
+def remove_flag_bit(model, field, flag):
+    """
+    Clears the bit of a BitFlagNameModel instance from the bitmask `field`
+    of every object, e.g. before the instance is deleted.
+    """
+
+    if flag.bit is None:
+        return
+
+    hits = f"{field}_hits"
+    model.objects.annotate(**{hits: models.F(field).bitand(flag.flag)}).filter(
+        **{f"{hits}__gt": 0}
+    ).update(**{field: models.F(field) - flag.flag})
+
+
+def get_changed_flag_mask_pks(
+    model, relation, instance, action, reverse, pk_set
+):
+    """
+    Returns the primary keys of the objects whose bitmask of a many-to-many
+    `relation` to a BitFlagNameModel is changed by an m2m_changed signal of
+    the relation, or an empty list if the signal does not change any.
+    Clearing the objects of a flag is only sent with the flag, so their
+    keys are kept on the flag when the clear starts.
+    """
+
+    if action == "pre_clear" and reverse:
+        through, source, target = get_flag_relation(model, relation)
+        instance._cleared_mask_pks = list(
+            through.objects.filter(**{target: instance}).values_list(
+                source, flat=True
+            )
+        )
+        return []
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return []
+
+    if not reverse:
+        return [instance.pk]
+    if action == "post_clear":
+        return getattr(instance, "_cleared_mask_pks", [])
+    return pk_set
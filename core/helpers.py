@@ -0,0 +1,145 @@
+import csv
+import io
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from tsv.helpers import normalize_title
+
+from .models import ActivityLog, Rating, Title
+from .serializers import RatingSerializer
+
+BULK_RATING_BATCH_SIZE = 500
+MAX_BULK_RATINGS = 10000
+
+# Accepted CSV headers for each column, including the ones used by the
+# ratings export of IMDb.
+RATING_CSV_COLUMNS = {
+    "id": ("id", "const"),
+    "rating": ("rating", "your rating"),
+}
+
+
+def read_ratings_csv(file):
+    """
+    Reads an uploaded CSV file of ratings into a list of dictionaries with
+    `id` and `rating` keys. Column headers are matched case-insensitively
+    against RATING_CSV_COLUMNS.
+
+    Args:
+        file: UploadedFile containing the CSV data
+
+    Returns:
+        rows: list of dictionaries containing `id` and `rating`
+    """
+
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig"))
+    headers = {
+        header.strip().lower(): header for header in reader.fieldnames or []
+    }
+
+    columns = {}
+    for key, aliases in RATING_CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[key] = headers[alias]
+                break
+        else:
+            raise ValueError(f"Missing `{key}` column")
+
+    return [
+        {key: row.get(header) for key, header in columns.items()}
+        for row in reader
+    ]
+
+
+def clean_ratings(rows):
+    """
+    Validates the `id` and `rating` of every row. Title ids may be integers
+    or IMDb ids e.g. `tt0000001`, and ratings are validated as in
+    RatingSerializer: integers between 1 and 10, or strings of them, but
+    not e.g. `7.9` or `true`. If a title appears more than once, the last
+    rating is kept.
+
+    Args:
+        rows: list of dictionaries containing `id` and `rating`
+
+    Returns:
+        ratings: dictionary mapping title ids to ratings, in input order
+        invalid: list of row indexes which could not be read
+    """
+
+    ratings = {}
+    invalid = []
+    rating_field = RatingSerializer().fields["rating"]
+
+    for index, row in enumerate(rows):
+        try:
+            title_id = normalize_title(str(row["id"]).strip())
+            rating = rating_field.run_validation(row["rating"])
+        except (KeyError, TypeError, ValueError, ValidationError):
+            invalid.append(index)
+            continue
+
+        if not title_id:
+            invalid.append(index)
+            continue
+
+        ratings.pop(title_id, None)
+        ratings[title_id] = rating
+
+    return ratings, invalid
+
+
+def import_ratings(user, ratings):
+    """
+    Saves many ratings of a user at once. Title ids are validated against
+    the catalog in a single query, and ratings are written in batches of
+    BULK_RATING_BATCH_SIZE. As with single ratings, previous ratings of the
+    same titles are marked as outdated.
+
+    Ratings are bulk created, so no `add_rating` signal is sent. Instead,
+    the rating aggregates of every affected title are updated once, and a
+    single ActivityLog entry summarizes the import.
+
+    Args:
+        user: User instance who submitted the ratings
+        ratings: dictionary mapping title ids to ratings
+
+    Returns:
+        title_ids: list of title ids which were rated
+    """
+
+    existing_ids = set(
+        Title.objects.filter(id__in=ratings).values_list("id", flat=True)
+    )
+    title_ids = [title_id for title_id in ratings if title_id in existing_ids]
+
+    if not title_ids:
+        return title_ids
+
+    with transaction.atomic():
+        for start in range(0, len(title_ids), BULK_RATING_BATCH_SIZE):
+            batch = title_ids[start : start + BULK_RATING_BATCH_SIZE]
+
+            Rating.objects.filter(
+                user=user, title__in=batch, outdated=False
+            ).update(outdated=True)
+            Rating.objects.bulk_create(
+                [
+                    Rating(
+                        user=user, title_id=title_id, rating=ratings[title_id]
+                    )
+                    for title_id in batch
+                ]
+            )
+
+        Title.objects.update_rating_aggregates(title_ids)
+
+        ActivityLog.objects.create(
+            title_id=title_ids[0],
+            user=user,
+            action=f"Imported {len(title_ids)} ratings",
+        )
+
+    return title_ids
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.autocomplete import build_autocomplete_index
+
+
+class Command(BaseCommand):
+    help = "Build the autocomplete index of titles and people"
+
+    def handle(self, *args, **options):
+        count = build_autocomplete_index()
+        self.stdout.write(f"Built autocomplete index with {count} names")
@@ -0,0 +1,46 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from common.images import create_renditions
+from core.models import Person, Title
+
+
+class Command(BaseCommand):
+    help = "Create the renditions of every Title, Person and User image"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Recreate renditions which exist already",
+        )
+
+    def handle(self, *args, **options):
+        names = []
+        for model in (Title, Person, get_user_model()):
+            names.extend(
+                model.objects.exclude(image="")
+                .values_list("image", flat=True)
+                .iterator()
+            )
+
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            count = sum(
+                executor.map(
+                    partial(create_renditions, force=options["force"]),
+                    names,
+                    chunksize=16,
+                )
+            )
+
+        self.stdout.write(f"Created {count} renditions of {len(names)} images")
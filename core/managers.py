@@ -1,20 +1,117 @@
 from django.db import models
-from django.db.models import Avg, F, Q
+from django.db.models import Avg, Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .cache import RATING_VERSION, bump_version, invalidate_objects
+from .flags import update_flag_masks
+
+RATING_AGGREGATES_BATCH_SIZE = 500
+POPULARITY_BATCH_SIZE = 500
 
 
 class TitleManager(models.Manager):
     """
-    Manager for Title model to automatically annotate average rating
+    Manager for Title model, to maintain the stored rating aggregates,
+    popularity and genre masks
     """
 
-    def get_queryset(self):
-        return (
-            super()
-            .get_queryset()
-            .annotate(
-                rating=Avg(
-                    F("ratings__rating"),
-                    filter=Q(ratings__outdated=False),
+    def update_genre_masks(self, title_ids):
+        """
+        Recalculates the genre bitmask of the given titles from their
+        genres, see update_flag_masks.
+        """
+
+        update_flag_masks(self.model, "genre_mask", "genres", title_ids)
+
+    def update_rating_aggregates(self, title_ids):
+        """
+        Recalculates the average rating and rating count of the given titles
+        from their current ratings. Runs one grouped query over the ratings
+        and one bulk update per batch of titles, regardless of how many
+        ratings changed. Cached detail responses of the titles, and of the
+        people they are known for titles of, are invalidated, and so are
+        cached searches which filter or sort by rating.
+        """
+
+        title_ids = list(set(title_ids))
+        rating_model = self.model._meta.get_field("ratings").related_model
+        known_for = self.model._meta.get_field("known_for_titles").through
+
+        for start in range(0, len(title_ids), RATING_AGGREGATES_BATCH_SIZE):
+            batch = title_ids[start : start + RATING_AGGREGATES_BATCH_SIZE]
+            aggregates = {
+                row["title"]: row
+                for row in rating_model.objects.filter(
+                    title__in=batch, outdated=False
                 )
+                .values("title")
+                .annotate(average=Avg("rating"), count=Count("id"))
+            }
+
+            titles = []
+            for title_id in batch:
+                row = aggregates.get(title_id, {})
+                titles.append(
+                    self.model(
+                        id=title_id,
+                        rating=row.get("average"),
+                        rating_count=row.get("count", 0),
+                    )
+                )
+
+            self.bulk_update(titles, ["rating", "rating_count"])
+            invalidate_objects(
+                "person",
+                known_for.objects.filter(title__in=batch)
+                .order_by()
+                .values_list("person_id", flat=True)
+                .distinct(),
             )
+
+        invalidate_objects("title", title_ids)
+        bump_version(RATING_VERSION)
+        self.update_popularity(title_ids)
+
+    def update_popularity(self, title_ids):
+        """
+        Recalculates the popularity of the given titles, which is their
+        rating count plus the number of watchlists and favorites they are
+        in. Runs one update with a count subquery per list, per batch of
+        titles. Cached search results are not invalidated, so searches
+        sorted by popularity are reordered once they expire, see
+        SEARCH_RESULTS_CACHE_TIMEOUT.
+        """
+
+        title_ids = list(set(title_ids))
+        popularity = F("rating_count")
+
+        for relation in ("watchlist_set", "favorites_set"):
+            through = self.model._meta.get_field(relation).through
+            counts = (
+                through.objects.filter(title=OuterRef("pk"))
+                .order_by()
+                .values("title")
+                .annotate(count=Count("pk"))
+                .values("count")
+            )
+            popularity += Coalesce(Subquery(counts), 0)
+
+        for start in range(0, len(title_ids), POPULARITY_BATCH_SIZE):
+            batch = title_ids[start : start + POPULARITY_BATCH_SIZE]
+            self.filter(id__in=batch).update(popularity=popularity)
+
+
+class PersonManager(models.Manager):
+    """
+    Manager for Person model, to maintain the stored profession masks
+    """
+
+    def update_profession_masks(self, person_ids):
+        """
+        Recalculates the profession bitmask of the given people from their
+        professions, see update_flag_masks.
+        """
+
+        update_flag_masks(
+            self.model, "profession_mask", "professions", person_ids
         )
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:23
+
+from django.db import migrations, models
+from django.db.models import Avg, Count
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Rating = apps.get_model("core", "Rating")
+    Title = apps.get_model("core", "Title")
+
+    aggregates = (
+        Rating.objects.filter(outdated=False)
+        .values("title")
+        .annotate(average=Avg("rating"), count=Count("id"))
+    )
+
+    for row in aggregates.iterator():
+        Title.objects.filter(id=row["title"]).update(
+            rating=row["average"], rating_count=row["count"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_auto_20210928_1524"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="title",
+            name="rating",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="title",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            backfill_rating_aggregates, migrations.RunPython.noop
+        ),
+    ]
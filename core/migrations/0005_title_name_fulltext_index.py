@@ -0,0 +1,31 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:31
+
+from django.db import migrations
+
+
+# FULLTEXT indexes are MySQL specific, so the index is created with raw SQL
+# and skipped on other databases, where search falls back to LIKE filters.
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "CREATE FULLTEXT INDEX core_title_name_fulltext "
+            "ON core_title (name)"
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "DROP INDEX core_title_name_fulltext ON core_title"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_title_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:48
+
+from django.db import migrations
+
+
+# FULLTEXT indexes are MySQL specific, so the index is created with raw SQL
+# and skipped on other databases, where search falls back to LIKE filters.
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "CREATE FULLTEXT INDEX core_titlename_name_fulltext "
+            "ON core_titlename (name)"
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "mysql":
+        schema_editor.execute(
+            "DROP INDEX core_titlename_name_fulltext ON core_titlename"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_title_name_fulltext_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_titlename_name_fulltext_index"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="activitylog",
+            index=models.Index(
+                fields=["-created_at", "-id"],
+                name="core_activi_created_310eb8_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="person",
+            index=models.Index(
+                fields=["name", "id"], name="core_person_name_927bfd_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["title", "outdated", "-id"],
+                name="core_review_title_i_eaaa8c_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="title",
+            index=models.Index(
+                fields=["-rating", "start_year", "id"],
+                name="core_title_rating_0a5c5b_idx",
+            ),
+        ),
+    ]
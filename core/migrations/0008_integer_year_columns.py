@@ -0,0 +1,67 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:29
+
+from django.db import migrations, models
+
+YEAR_FIELDS = {
+    "Title": ["start_year", "end_year"],
+    "Person": ["birth_year", "death_year"],
+}
+
+
+def clear_invalid_years(apps, schema_editor):
+    """
+    Sets years which are not a number, e.g. blank strings saved by the
+    admin, to NULL so that the columns can be converted to integers.
+    """
+
+    for model_name, fields in YEAR_FIELDS.items():
+        model = apps.get_model("core", model_name)
+        for field in fields:
+            model.objects.exclude(**{f"{field}__isnull": True}).exclude(
+                **{f"{field}__regex": r"^[0-9]{1,4}$"}
+            ).update(**{field: None})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_invalid_years, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="person",
+            name="birth_year",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="person",
+            name="death_year",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="title",
+            name="end_year",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="title",
+            name="start_year",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="title",
+            index=models.Index(
+                fields=["start_year", "id"],
+                name="core_title_start_y_d7b77c_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="title",
+            index=models.Index(
+                fields=["type", "start_year"],
+                name="core_title_type_id_73d1cd_idx",
+            ),
+        ),
+    ]
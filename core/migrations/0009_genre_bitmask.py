@@ -0,0 +1,50 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:31
+
+from django.db import migrations, models
+
+
+def backfill_genre_masks(apps, schema_editor):
+    """
+    Assigns a bit to every genre, and sets the bit in the genre mask of its
+    titles, with one update per genre.
+    """
+
+    Genre = apps.get_model("core", "Genre")
+    Title = apps.get_model("core", "Title")
+
+    for bit, genre in enumerate(Genre.objects.order_by("pk")):
+        if bit >= 32:
+            raise ValueError("Too many genres for the genre_mask bitmask")
+
+        genre.bit = bit
+        genre.save(update_fields=["bit"])
+
+        title_ids = Title.genres.through.objects.filter(genre=genre).values(
+            "title_id"
+        )
+        Title.objects.filter(pk__in=title_ids).update(
+            genre_mask=models.F("genre_mask") + (1 << bit)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_integer_year_columns"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="genre",
+            name="bit",
+            field=models.PositiveSmallIntegerField(
+                editable=False, null=True, unique=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="title",
+            name="genre_mask",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_genre_masks, migrations.RunPython.noop),
+    ]
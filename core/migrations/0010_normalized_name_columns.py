@@ -0,0 +1,78 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:36
+
+from django.db import migrations, models
+
+from common.utils import MAX_STRING_LENGTH, normalize_name
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_normalized_names(apps, schema_editor):
+    for model_name in ("Title", "TitleName", "Person"):
+        model = apps.get_model("core", model_name)
+        batch = []
+
+        for instance in model.objects.only("id", "name").iterator():
+            instance.normalized_name = normalize_name(instance.name)[
+                :MAX_STRING_LENGTH
+            ]
+            batch.append(instance)
+
+            if len(batch) == BACKFILL_BATCH_SIZE:
+                model.objects.bulk_update(batch, ["normalized_name"])
+                batch = []
+
+        model.objects.bulk_update(batch, ["normalized_name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_genre_bitmask"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="person",
+            name="core_person_name_927bfd_idx",
+        ),
+        migrations.AddField(
+            model_name="person",
+            name="normalized_name",
+            field=models.CharField(default="", editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="title",
+            name="normalized_name",
+            field=models.CharField(default="", editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="titlename",
+            name="normalized_name",
+            field=models.CharField(default="", editable=False, max_length=255),
+        ),
+        migrations.RunPython(
+            backfill_normalized_names, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name="person",
+            index=models.Index(
+                fields=["normalized_name", "id"],
+                name="core_person_normali_1c05f2_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="title",
+            index=models.Index(
+                fields=["normalized_name"],
+                name="core_title_normali_a0a337_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="titlename",
+            index=models.Index(
+                fields=["normalized_name"],
+                name="core_titlen_normali_141824_idx",
+            ),
+        ),
+    ]
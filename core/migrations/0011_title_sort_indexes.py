@@ -0,0 +1,78 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:38
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_popularity(apps, schema_editor):
+    Title = apps.get_model("core", "Title")
+    User = apps.get_model("users", "User")
+    popularity = F("rating_count")
+
+    for through in (User.watchlist.through, User.favorites.through):
+        counts = (
+            through.objects.filter(title=OuterRef("pk"))
+            .order_by()
+            .values("title")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        popularity += Coalesce(Subquery(counts), 0)
+
+    Title.objects.update(popularity=popularity)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_normalized_name_columns"),
+        ("users", "0006_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="title",
+            name="core_title_normali_a0a337_idx",
+        ),
+        migrations.AddField(
+            model_name="title",
+            name="popularity",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_popularity, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="title",
+            index=models.Index(
+                fields=["normalized_name", "id"],
+                name="core_title_normali_239440_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="title",
+            index=models.Index(
+                fields=["rating", "id"], name="core_title_rating_9d158e_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="title",
+            index=models.Index(
+                fields=["rating_count", "id"],
+                name="core_title_rating__9b5cdd_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="title",
+            index=models.Index(
+                fields=["runtime_minutes", "id"],
+                name="core_title_runtime_167061_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="title",
+            index=models.Index(
+                fields=["popularity", "id"],
+                name="core_title_popular_12f03c_idx",
+            ),
+        ),
+    ]
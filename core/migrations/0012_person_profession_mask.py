@@ -0,0 +1,65 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:42
+
+from django.db import migrations, models
+
+
+def backfill_profession_masks(apps, schema_editor):
+    """
+    Assigns a bit to every profession, and sets the bit in the profession
+    mask of its people, with one update per profession.
+    """
+
+    Profession = apps.get_model("core", "Profession")
+    Person = apps.get_model("core", "Person")
+
+    for bit, profession in enumerate(Profession.objects.order_by("pk")):
+        if bit >= 63:
+            raise ValueError(
+                "Too many professions for the profession_mask bitmask"
+            )
+
+        profession.bit = bit
+        profession.save(update_fields=["bit"])
+
+        person_ids = Person.professions.through.objects.filter(
+            profession=profession
+        ).values("person_id")
+        Person.objects.filter(pk__in=person_ids).update(
+            profession_mask=models.F("profession_mask") + (1 << bit)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_title_sort_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="person",
+            options={"base_manager_name": "objects"},
+        ),
+        migrations.AddField(
+            model_name="person",
+            name="profession_mask",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="profession",
+            name="bit",
+            field=models.PositiveSmallIntegerField(
+                editable=False, null=True, unique=True
+            ),
+        ),
+        migrations.RunPython(
+            backfill_profession_masks, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name="person",
+            index=models.Index(
+                fields=["birth_year", "id"],
+                name="core_person_birth_y_a7de15_idx",
+            ),
+        ),
+    ]
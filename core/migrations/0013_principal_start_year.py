@@ -0,0 +1,44 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:50
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_start_year(apps, schema_editor):
+    Principal = apps.get_model("core", "Principal")
+    Title = apps.get_model("core", "Title")
+
+    Principal.objects.update(
+        start_year=Subquery(
+            Title.objects.filter(pk=OuterRef("title")).values("start_year")
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_person_profession_mask"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="principal",
+            options={"ordering": ["-start_year", "-id"]},
+        ),
+        migrations.AddField(
+            model_name="principal",
+            name="start_year",
+            field=models.PositiveSmallIntegerField(
+                blank=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(backfill_start_year, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="principal",
+            index=models.Index(
+                fields=["person", "category", "start_year", "id"],
+                name="core_princi_person__237aa2_idx",
+            ),
+        ),
+    ]
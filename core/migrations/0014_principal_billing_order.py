@@ -0,0 +1,55 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def backfill_billing_order(apps, schema_editor):
+    """
+    Numbers the principals of each title in the order they were created,
+    which is the order of title.principals.tsv.
+    """
+
+    Principal = apps.get_model("core", "Principal")
+    rows = Principal.objects.order_by("title", "id").values_list("id", "title")
+
+    batch = []
+    title_id = None
+    for principal_id, principal_title_id in rows.iterator():
+        if principal_title_id != title_id:
+            title_id = principal_title_id
+            billing_order = 0
+        billing_order += 1
+
+        batch.append(Principal(id=principal_id, billing_order=billing_order))
+        if len(batch) == BATCH_SIZE:
+            Principal.objects.bulk_update(batch, ["billing_order"])
+            batch = []
+
+    Principal.objects.bulk_update(batch, ["billing_order"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_principal_start_year"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="principal",
+            name="billing_order",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            backfill_billing_order, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name="principal",
+            index=models.Index(
+                fields=["title", "billing_order"],
+                name="core_princi_title_i_df9494_idx",
+            ),
+        ),
+    ]
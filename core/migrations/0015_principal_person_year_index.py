@@ -0,0 +1,20 @@
+# Generated by Django 3.2.6 on 2026-10-19 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_principal_billing_order"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="principal",
+            index=models.Index(
+                fields=["person", "start_year", "id"],
+                name="core_princi_person__7b9e17_idx",
+            ),
+        ),
+    ]
@@ -1,4 +1,30 @@
 from django.contrib import admin
+from django.db.models import Q
+
+from common.utils import normalize_name
+
+from .search import get_name_prefix_filter
+
+
+class NormalizedNameSearchMixin:
+    """
+    ModelAdmin mixin for NormalizedNameModels, which matches each word of
+    the search term as the start of a word of `normalized_name`, see
+    get_name_prefix_filter, or the term as an exact id if it is a number.
+    """
+
+    search_fields = ("id", "normalized_name")
+
+    def get_search_results(self, request, queryset, search_term):
+        name = normalize_name(search_term)
+        if not name:
+            return queryset, False
+
+        condition = get_name_prefix_filter(name)
+        if name.isdigit():
+            condition |= Q(id=int(name))
+
+        return queryset.filter(condition), False
 
 
 class RatingReviewAdmin(admin.ModelAdmin):
@@ -89,7 +115,7 @@ class CrewAdmin(admin.ModelAdmin):
     ordering = ("-id",)
 
 
-class PersonAdmin(admin.ModelAdmin):
+class PersonAdmin(NormalizedNameSearchMixin, admin.ModelAdmin):
     """
     Admin site settings for Person model.
     """
@@ -106,14 +132,10 @@ class PersonAdmin(admin.ModelAdmin):
     filter_horizontal = ("professions",)
     raw_id_fields = ("known_for_titles",)
     list_display = ("id", "name")
-    search_fields = (
-        "id",
-        "name",
-    )
     ordering = ("-id",)
 
 
-class TitleAdmin(admin.ModelAdmin):
+class TitleAdmin(NormalizedNameSearchMixin, admin.ModelAdmin):
     """
     ModelAdmin for Title model.
     """
@@ -131,8 +153,4 @@ class TitleAdmin(admin.ModelAdmin):
     filter_horizontal = ("genres",)
     list_display = ("id", "name", "start_year", "end_year", "is_adult")
     list_filter = ("is_adult",)
-    search_fields = (
-        "id",
-        "name",
-    )
     ordering = ("-id",)
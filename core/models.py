@@ -4,18 +4,20 @@ from django.db import models
 
 from common.utils import (
     MAX_STRING_LENGTH,
-    YEAR_LENGTH,
     BaseTimestampsModel,
+    BitFlagNameModel,
+    NormalizedNameModel,
     SimpleNameModel,
 )
 
-from .managers import TitleManager
+from .managers import PersonManager, TitleManager
 
 
-class Genre(SimpleNameModel):
+class Genre(BitFlagNameModel):
     """
     Genre model, for title genres e.g. Horror, Romance, etc. Stores
-    the string attribute `name` as primary_key.
+    the string attribute `name` as primary_key. Each genre has a `bit` in
+    Title.genre_mask.
     """
 
     pass
@@ -31,40 +33,62 @@ class TitleType(SimpleNameModel):
     pass
 
 
-class Profession(SimpleNameModel):
+class Profession(BitFlagNameModel):
     """
     Profession model, for person professions e.g. writer, talent_agent,
     stunt, etc. Stores the string attribute `profession` as
-    primary_key.
+    primary_key. Each profession has a `bit` in Person.profession_mask.
     """
 
-    pass
+    # Person.profession_mask is a signed 64-bit integer on some databases
+    max_bits = 63
 
 
-class Title(BaseTimestampsModel):
+class Title(NormalizedNameModel, BaseTimestampsModel):
     """
     Title model, for basic information of every title. Stores integer
     attribute `id` as primary_key. References TitleType and Genre as
     foreign_key.
+
+    `rating` and `rating_count` store the average and number of current
+    (non-outdated) ratings, and are maintained by
+    TitleManager.update_rating_aggregates. `popularity` is the rating count
+    plus the number of watchlists and favorites of the title, and is
+    maintained by TitleManager.update_popularity. `genre_mask` stores the
+    bits of the title's genres, and is maintained by
+    TitleManager.update_genre_masks.
+    `normalized_name` is maintained on save, see NormalizedNameModel.
     """
 
     class Meta:
         base_manager_name = "objects"
+        indexes = [
+            models.Index(fields=["-rating", "start_year", "id"]),
+            models.Index(fields=["start_year", "id"]),
+            models.Index(fields=["type", "start_year"]),
+            models.Index(fields=["normalized_name", "id"]),
+            models.Index(fields=["rating", "id"]),
+            models.Index(fields=["rating_count", "id"]),
+            models.Index(fields=["runtime_minutes", "id"]),
+            models.Index(fields=["popularity", "id"]),
+        ]
 
     id = models.PositiveBigIntegerField(primary_key=True)
     type = models.ForeignKey(TitleType, null=True, on_delete=models.SET_NULL)
     name = models.CharField(max_length=MAX_STRING_LENGTH)
     is_adult = models.BooleanField(default=False)
-    start_year = models.CharField(
-        max_length=YEAR_LENGTH, null=True, blank=True
-    )
-    end_year = models.CharField(max_length=YEAR_LENGTH, null=True, blank=True)
+    start_year = models.PositiveSmallIntegerField(null=True, blank=True)
+    end_year = models.PositiveSmallIntegerField(null=True, blank=True)
     runtime_minutes = models.PositiveIntegerField(null=True, blank=True)
     genres = models.ManyToManyField(
         Genre, blank=True, related_name="genres", db_column="genre"
     )
     image = models.ImageField(upload_to="title", blank=True)
     description = models.TextField(blank=True)
+    rating = models.FloatField(null=True, blank=True, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    genre_mask = models.PositiveIntegerField(default=0, editable=False)
+    popularity = models.PositiveIntegerField(default=0, editable=False)
 
     objects = TitleManager()
 
@@ -72,7 +96,7 @@ class Title(BaseTimestampsModel):
         return self.name
 
 
-class TitleName(BaseTimestampsModel):
+class TitleName(NormalizedNameModel, BaseTimestampsModel):
     """
     TitleName model, for storing different names for a Title.
     Stores auto id as primary_key. References Title and TitleType as
@@ -93,22 +117,24 @@ class TitleName(BaseTimestampsModel):
         TitleType, blank=True, related_name="attributes"
     )
 
+    class Meta:
+        indexes = [models.Index(fields=["normalized_name"])]
+
 
-class Person(BaseTimestampsModel):
+class Person(NormalizedNameModel, BaseTimestampsModel):
     """
     Person model, for information of people/performers. Stores integer
     attribute `id` as primary key. References Profession and
     Title as foreign_key.
+
+    `profession_mask` stores the bits of the person's professions, and is
+    maintained by PersonManager.update_profession_masks.
     """
 
     id = models.PositiveBigIntegerField(primary_key=True)
     name = models.CharField(max_length=MAX_STRING_LENGTH)
-    birth_year = models.CharField(
-        max_length=YEAR_LENGTH, null=True, blank=True
-    )
-    death_year = models.CharField(
-        max_length=YEAR_LENGTH, null=True, blank=True
-    )
+    birth_year = models.PositiveSmallIntegerField(null=True, blank=True)
+    death_year = models.PositiveSmallIntegerField(null=True, blank=True)
     professions = models.ManyToManyField(
         Profession,
         blank=True,
@@ -120,6 +146,16 @@ class Person(BaseTimestampsModel):
     )
     image = models.ImageField(upload_to="person", blank=True)
     description = models.TextField(blank=True)
+    profession_mask = models.PositiveBigIntegerField(default=0, editable=False)
+
+    objects = PersonManager()
+
+    class Meta:
+        base_manager_name = "objects"
+        indexes = [
+            models.Index(fields=["normalized_name", "id"]),
+            models.Index(fields=["birth_year", "id"]),
+        ]
 
     def __str__(self):
         return self.name
@@ -130,6 +166,15 @@ class Principal(BaseTimestampsModel):
     Person model, for information of a Person's contribution in a
     Title. Stores auto id as primary_key References Title and
     Person as foreign_key.
+
+    `start_year` is a copy of the title's start year, so that a person's
+    filmography is read and ordered from an index without joining Title. It
+    is set on save, and kept up to date by the update_principal_years
+    signal.
+
+    `billing_order` is the position of the principal in the title's
+    credits, starting from 1. Principals saved without one are billed after
+    the title's other principals.
     """
 
     title = models.ForeignKey(
@@ -141,9 +186,29 @@ class Principal(BaseTimestampsModel):
     category = models.CharField(max_length=MAX_STRING_LENGTH)
     job = models.CharField(max_length=MAX_STRING_LENGTH, null=True, blank=True)
     characters = models.TextField(null=True, blank=True)
+    start_year = models.PositiveSmallIntegerField(
+        null=True, blank=True, editable=False
+    )
+    billing_order = models.PositiveSmallIntegerField(null=True, blank=True)
 
     class Meta:
-        ordering = ["-title__start_year", "-title__end_year"]
+        ordering = ["-start_year", "-id"]
+        indexes = [
+            models.Index(fields=["person", "start_year", "id"]),
+            models.Index(fields=["person", "category", "start_year", "id"]),
+            models.Index(fields=["title", "billing_order"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.start_year = self.title.start_year
+
+        if self.billing_order is None:
+            last = Principal.objects.filter(title=self.title_id).aggregate(
+                last=models.Max("billing_order")
+            )["last"]
+            self.billing_order = (last or 0) + 1
+
+        super().save(*args, **kwargs)
 
     def __str__(self):
         person = f"{self.person.name} ({self.person.id})"
@@ -190,6 +255,9 @@ class Review(BaseTimestampsModel):
     review = models.TextField()
     outdated = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [models.Index(fields=["title", "outdated", "-id"])]
+
 
 class ActivityLog(BaseTimestampsModel):
     """
@@ -211,6 +279,9 @@ class ActivityLog(BaseTimestampsModel):
         Review, on_delete=models.CASCADE, blank=True, null=True
     )
 
+    class Meta:
+        indexes = [models.Index(fields=["-created_at", "-id"])]
+
 
 class Crew(models.Model):
     """
@@ -0,0 +1,521 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ParseError
+
+from common.fieldsets import FIELDSET_PARAMS
+from common.pagination import get_count_result
+from common.utils import normalize_name
+
+from .autocomplete import TITLE, get_autocomplete_index
+from .cache import SEARCH_VERSION, get_versions
+from .models import Genre, Profession, TitleName, TitleType
+
+# Maximum number of matches read from each search index. Matches beyond
+# this are rarely paged to, and keeping the candidate set bounded keeps
+# every search query index-driven.
+MAX_SEARCH_MATCHES = 10000
+
+# Sort modes of TitleSearch, mapping each `sort` param to the ordering of
+# its ascending form. A `-` prefix reverses every field. Each ordering is
+# backed by an index on the same columns, which is read backwards for
+# descending sorts, so the first page of a sort is an index range read.
+#
+#   rating      index (rating, id), titles without ratings first
+#   votes       index (rating_count, id)
+#   year        index (start_year, id)
+#   runtime     index (runtime_minutes, id)
+#   name        index (normalized_name, id)
+#   popularity  index (popularity, id), the rating count plus the number
+#               of watchlists and favorites
+#
+# With selective filters, the database may read the filtered rows and sort
+# them instead, which costs a sort of the matching rows. A `name` search
+# matches at most MAX_SEARCH_MATCHES titles from each search index, so
+# sorting its results is bounded.
+TITLE_SORTS = {
+    "rating": ("rating", "id"),
+    "votes": ("rating_count", "id"),
+    "year": ("start_year", "id"),
+    "runtime": ("runtime_minutes", "id"),
+    "name": ("normalized_name", "id"),
+    "popularity": ("popularity", "id"),
+}
+
+# Sort modes of TitleSearch which order by the rating aggregates. Cached
+# results of these sorts, of the default ordering and of name searches,
+# which are ordered by rating as well, are invalidated when ratings change.
+RATING_SORTS = ("rating", "votes")
+
+# Number of result ids kept per cached search. Pages past these results
+# are read from the database.
+MAX_CACHED_RESULTS = 1000
+
+# Query params which do not change the results of a search.
+PAGINATION_PARAMS = ("page", "page_size", "cursor", "facets")
+
+# First decade of the decade facet. Titles before it are not counted.
+FACET_FIRST_DECADE = 1870
+
+# InnoDB does not index words shorter than `innodb_ft_min_token_size`, so
+# shorter search terms can not be required in a full-text query.
+FULLTEXT_MIN_TOKEN_SIZE = 3
+
+
+def get_search_terms(query):
+    """
+    Splits a search query into the words of its normalized form, see
+    normalize_name. Characters other than letters and digits are dropped,
+    which also removes the operators of MySQL boolean full-text search.
+
+    Args:
+        query: string containing the search query
+
+    Returns:
+        terms: list of words in the query
+    """
+
+    return normalize_name(query).split()
+
+
+def get_boolean_query(terms):
+    """
+    Builds a MySQL boolean mode full-text query, which matches every term as
+    a word prefix e.g. `+shaw* +redemp*`.
+    """
+
+    return " ".join(
+        f"+{term}*" if len(term) >= FULLTEXT_MIN_TOKEN_SIZE else f"{term}*"
+        for term in terms
+    )
+
+
+def fulltext_relevance(model, column, terms):
+    """
+    Returns an expression of the full-text relevance of `column` for the
+    terms. The column must have a FULLTEXT index.
+    """
+
+    quote_name = connection.ops.quote_name
+    column = f"{quote_name(model._meta.db_table)}.{quote_name(column)}"
+
+    return RawSQL(
+        f"MATCH ({column}) AGAINST (%s IN BOOLEAN MODE)",
+        (get_boolean_query(terms),),
+        output_field=FloatField(),
+    )
+
+
+def word_prefix_filter(field, terms):
+    """
+    Returns a Q object which matches rows where every term is a prefix of a
+    word in `field`, which must be a normalized name. Used on databases
+    without full-text search.
+    """
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(**{f"{field}__startswith": term}) | Q(
+            **{f"{field}__contains": f" {term}"}
+        )
+
+    return condition
+
+
+def get_matching_ids(queryset, field, terms):
+    """
+    Returns the ids in `field` of up to MAX_SEARCH_MATCHES rows of the
+    queryset whose `name` matches every term as a word prefix, using the
+    FULLTEXT index of `name` on MySQL.
+    """
+
+    if connection.vendor == "mysql":
+        relevance = fulltext_relevance(queryset.model, "name", terms)
+        queryset = (
+            queryset.annotate(relevance=relevance)
+            .filter(relevance__gt=0)
+            .order_by("-relevance")
+        )
+    else:
+        queryset = queryset.filter(
+            word_prefix_filter("normalized_name", terms)
+        )
+
+    return queryset.values_list(field, flat=True)[:MAX_SEARCH_MATCHES]
+
+
+def search_titles(queryset, query):
+    """
+    Filters a Title queryset to titles whose name, or one of whose
+    alternate names (TitleName), matches every word of the query as a word
+    prefix. Each title is annotated with a `relevance` score of its own
+    name, so titles matched only by an alternate name score lowest.
+
+    On MySQL, this uses the FULLTEXT indexes on `core_title.name` and
+    `core_titlename.name`. On other databases, it falls back to word-prefix
+    LIKE filters on the normalized names, and ranks exact and leading
+    matches above other matches.
+
+    If no name matches, titles with similar names are returned instead,
+    see fuzzy_filter, so that queries with typos still find results.
+
+    Args:
+        queryset: Title queryset to filter
+        query: string containing the search query
+
+    Returns:
+        queryset: filtered and annotated Title queryset
+    """
+
+    terms = get_search_terms(query)
+    if not terms:
+        return no_matches(queryset)
+
+    title_ids = set(get_matching_ids(queryset.model.objects, "id", terms))
+    title_ids.update(get_matching_ids(TitleName.objects, "title_id", terms))
+    if not title_ids:
+        return fuzzy_filter(queryset, TITLE, query)
+
+    queryset = queryset.filter(id__in=title_ids)
+
+    if connection.vendor == "mysql":
+        relevance = fulltext_relevance(queryset.model, "name", terms)
+    else:
+        normalized_query = " ".join(terms)
+        relevance = Case(
+            When(normalized_name=normalized_query, then=Value(3.0)),
+            When(
+                normalized_name__startswith=normalized_query, then=Value(2.0)
+            ),
+            When(
+                word_prefix_filter("normalized_name", terms), then=Value(1.0)
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+
+    return queryset.annotate(relevance=relevance)
+
+
+def no_matches(queryset):
+    """
+    Returns an empty queryset, annotated with `relevance` as the results of
+    a search are, so that it can be ordered by relevance.
+    """
+
+    return queryset.none().annotate(
+        relevance=Value(0.0, output_field=FloatField())
+    )
+
+
+def fuzzy_filter(queryset, kind, query):
+    """
+    Filters a Title or Person queryset to the objects whose names are most
+    similar to the query, using the trigram index of the autocomplete index
+    file. Each object is annotated with its trigram similarity as
+    `relevance`. If the index has not been built, nothing matches.
+
+    Args:
+        queryset: Title or Person queryset to filter
+        kind: autocomplete entry kind of the queryset, TITLE or PERSON
+        query: string containing the search query
+
+    Returns:
+        queryset: filtered and annotated queryset
+    """
+
+    index = get_autocomplete_index()
+    matches = index.fuzzy_search(query, kind) if index else []
+    if not matches:
+        return no_matches(queryset)
+
+    relevance = Case(
+        *[
+            When(id=object_id, then=Value(similarity))
+            for object_id, similarity in matches
+        ],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return queryset.filter(
+        id__in=[object_id for object_id, _ in matches]
+    ).annotate(relevance=relevance)
+
+
+def get_name_prefix_filter(query):
+    """
+    Returns a Q object which matches NormalizedNameModels whose normalized
+    name has a word starting with each word of the normalized query, e.g.
+    `scorsese` and `mart scor` both match `martin scorsese`. Returns None if
+    the query has no words.
+
+    A word starts either the name or after a space, since normalize_name
+    separates words with single spaces. `istartswith` is used although
+    both sides are already lowercase, because MySQL can only use the index
+    on `normalized_name` for a plain `LIKE`, not for the `LIKE BINARY` of
+    `startswith`. Matches of later words are found with `icontains`, which
+    scans the names.
+    """
+
+    terms = get_search_terms(query)
+    if not terms:
+        return None
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(normalized_name__istartswith=term) | Q(
+            normalized_name__icontains=f" {term}"
+        )
+
+    return condition
+
+
+def filter_name_prefix(queryset, query):
+    """
+    Filters a queryset of a NormalizedNameModel to the objects whose
+    normalized name has a word starting with each word of the query, see
+    get_name_prefix_filter.
+    """
+
+    condition = get_name_prefix_filter(query)
+    if condition is None:
+        return queryset.none()
+
+    return queryset.filter(condition)
+
+
+def get_title_ordering(sort):
+    """
+    Returns the queryset ordering of a TitleSearch sort mode, see
+    TITLE_SORTS. Raises ParseError, which returns an `HTTP 400 Bad Request`
+    response, if the sort mode is unknown.
+    """
+
+    fields = TITLE_SORTS.get(sort.removeprefix("-"))
+    if fields is None:
+        raise ParseError(
+            f"`sort` must be one of {', '.join(TITLE_SORTS)}, optionally "
+            "prefixed with `-`"
+        )
+
+    if sort.startswith("-"):
+        return [f"-{field}" for field in fields]
+
+    return list(fields)
+
+
+def filter_flags(queryset, field, flag_model, names, match_all=False):
+    """
+    Filters a queryset to objects whose bitmask `field` has the bit of any
+    of the given BitFlagNameModel names, or all of them if `match_all` is
+    True. The objects are annotated with the matching bits in `<field>_hits`.
+    """
+
+    mask, all_exist = flag_model.get_mask(names)
+    if not mask or (match_all and not all_exist):
+        return queryset.none()
+
+    hits = f"{field}_hits"
+    queryset = queryset.annotate(**{hits: F(field).bitand(mask)})
+    if match_all:
+        return queryset.filter(**{hits: mask})
+
+    return queryset.filter(**{f"{hits}__gt": 0})
+
+
+def filter_genres(queryset, genres, match_all=False):
+    """
+    Filters a Title queryset to titles with any of the given genres, or all
+    of them if `match_all` is True. Uses the genre bitmask of each title,
+    so no join with the genres table is needed.
+    """
+
+    return filter_flags(queryset, "genre_mask", Genre, genres, match_all)
+
+
+def filter_professions(queryset, professions, match_all=False):
+    """
+    Filters a Person queryset to people with any of the given professions,
+    or all of them if `match_all` is True. Uses the profession bitmask of
+    each person, so no join with the professions table is needed.
+    """
+
+    return filter_flags(
+        queryset, "profession_mask", Profession, professions, match_all
+    )
+
+
+def get_title_facets(key, get_queryset):
+    """
+    Counts the titles of a search per genre, decade of `start_year` and
+    title type. Every count is computed in a single aggregate query over the
+    search queryset, using the genre bitmask for genre counts, and the
+    result is cached for FACETS_CACHE_TIMEOUT seconds. The queryset is only
+    built if the counts are not cached. Facet values without any titles are
+    left out.
+
+    Args:
+        key: string cache key of the search, see get_search_cache_key
+        get_queryset: function which returns the filtered Title queryset
+
+    Returns:
+        facets: dictionary with `genres`, `decades` and `types` keys, each
+        mapping a facet value to its title count
+    """
+
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    queryset = get_queryset()
+
+    genres = dict(Genre.objects.exclude(bit=None).values_list("bit", "name"))
+    types = dict(TitleType.objects.values_list("id", "name"))
+    last_decade = timezone.now().year // 10 * 10 + 10
+    decades = range(FACET_FIRST_DECADE, last_decade + 1, 10)
+
+    aggregates = {}
+    for bit in genres:
+        # Each matching title adds its genre flag to the sum
+        aggregates[f"genre_{bit}"] = Sum(F("genre_mask").bitand(1 << bit))
+    for decade in decades:
+        aggregates[f"decade_{decade}"] = Count(
+            "id", filter=Q(start_year__gte=decade, start_year__lt=decade + 10)
+        )
+    for type_id in types:
+        aggregates[f"type_{type_id}"] = Count("id", filter=Q(type=type_id))
+
+    counts = queryset.order_by().aggregate(**aggregates)
+
+    facets = {"genres": {}, "decades": {}, "types": {}}
+    for bit, name in genres.items():
+        count = (counts[f"genre_{bit}"] or 0) >> bit
+        if count:
+            facets["genres"][name] = count
+    for decade in decades:
+        if counts[f"decade_{decade}"]:
+            facets["decades"][f"{decade}s"] = counts[f"decade_{decade}"]
+    for type_id, name in types.items():
+        if counts[f"type_{type_id}"]:
+            facets["types"][name] = counts[f"type_{type_id}"]
+
+    cache.set(key, facets, settings.FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+def get_search_cache_key(prefix, query_params, name_params=(), versions=()):
+    """
+    Returns the cache key of the results of a search. Params are sorted and
+    the values of `name_params` are normalized, so that equivalent searches
+    share a key. Pagination and fieldset params are left out, so every page
+    and fieldset of a search shares its results.
+
+    Args:
+        prefix: string identifying the search view
+        query_params: QueryDict of the request
+        name_params: names of the params which contain a name query
+        versions: names of versions the results depend on, in addition to
+        SEARCH_VERSION e.g. RATING_VERSION
+
+    Returns:
+        key: string cache key, including the current versions
+    """
+
+    params = []
+    for name in sorted(query_params):
+        if name in PAGINATION_PARAMS or name in FIELDSET_PARAMS:
+            continue
+
+        values = query_params.getlist(name)
+        if name in name_params:
+            values = [normalize_name(value) for value in values]
+        params.append((name, sorted(values)))
+
+    digest = hashlib.md5(json.dumps(params).encode()).hexdigest()
+    names = [SEARCH_VERSION, *versions]
+    found = get_versions(names)
+    version = ":".join(str(found[name]) for name in names)
+    return f"{prefix}:{version}:{digest}"
+
+
+class CachedSearchResults:
+    """
+    Sequence of the results of a search, which can be paginated like a
+    queryset. The ordered ids of the first MAX_CACHED_RESULTS results and
+    the result count are cached for SEARCH_RESULTS_CACHE_TIMEOUT seconds,
+    and each page of cached ids is read with a single `pk__in` query. Counts
+    of larger result sets are read with get_count_result, so they may be
+    estimates.
+
+    The search queryset is only built if the results are not cached, or a
+    page past the cached ids is read. If `fields` is passed, pages of cached
+    ids are read as dictionaries of these fields with values(), otherwise
+    as model instances.
+    """
+
+    def __init__(self, model, get_queryset, key, fields=None):
+        self.model = model
+        self.get_queryset = get_queryset
+        self.key = key
+        self.fields = fields
+
+    @cached_property
+    def queryset(self):
+        return self.get_queryset()
+
+    @cached_property
+    def results(self):
+        results = cache.get(self.key)
+        if results is not None:
+            return results
+
+        ids = list(
+            self.queryset.values_list("pk", flat=True)[
+                : MAX_CACHED_RESULTS + 1
+            ]
+        )
+        if len(ids) > MAX_CACHED_RESULTS:
+            ids = ids[:MAX_CACHED_RESULTS]
+            count, is_estimate = get_count_result(self.queryset)
+        else:
+            count, is_estimate = len(ids), False
+
+        results = ids, count, is_estimate
+        cache.set(self.key, results, settings.SEARCH_RESULTS_CACHE_TIMEOUT)
+        return results
+
+    @property
+    def count_result(self):
+        _, count, is_estimate = self.results
+        return count, is_estimate
+
+    def __len__(self):
+        return self.results[1]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("Search results can only be sliced")
+
+        ids, count, _ = self.results
+        stop = count if index.stop is None else index.stop
+        if stop > len(ids):
+            return list(self.queryset[index])
+
+        page_ids = ids[index]
+        if self.fields is None:
+            objects = self.model._default_manager.in_bulk(page_ids)
+        else:
+            pk_name = self.model._meta.pk.attname
+            rows = self.model._default_manager.filter(pk__in=page_ids)
+            objects = {
+                row[pk_name]: row for row in rows.values(pk_name, *self.fields)
+            }
+
+        return [objects[pk] for pk in page_ids if pk in objects]
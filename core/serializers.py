@@ -1,10 +1,19 @@
+from django.db.models import Count
 from rest_framework import serializers
 
-from common.utils import SimpleNameAndIdSerializer, SimpleNameSerializer
+from common.images import ImageRenditionsField
+from common.utils import (
+    SimpleNameAndIdSerializer,
+    SimpleNameSerializer,
+    get_related_fields,
+)
 from users.serializers import FollowSerializer
 
 from .models import ActivityLog, Crew, Person, Principal, Rating, Review, Title
 
+# Number of writers and directors included in TitleDetail responses
+MAX_DETAIL_CREW = 10
+
 
 class BasicTitleSerializer(serializers.ModelSerializer):
     """
@@ -15,6 +24,7 @@ class BasicTitleSerializer(serializers.ModelSerializer):
     rating = serializers.DecimalField(
         max_digits=3, decimal_places=1, required=False
     )
+    image_renditions = ImageRenditionsField(source="image")
 
     class Meta:
         model = Title
@@ -24,6 +34,7 @@ class BasicTitleSerializer(serializers.ModelSerializer):
             "start_year",
             "end_year",
             "image",
+            "image_renditions",
             "rating",
         ]
 
@@ -34,12 +45,15 @@ class BasicPersonSerializer(serializers.ModelSerializer):
     information.
     """
 
+    image_renditions = ImageRenditionsField(source="image")
+
     class Meta:
         model = Person
         fields = [
             "id",
             "name",
             "image",
+            "image_renditions",
         ]
 
 
@@ -53,7 +67,7 @@ class TitlePrincipalsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Principal
-        fields = ["person", "category", "characters"]
+        fields = ["person", "billing_order", "category", "characters"]
 
 
 class PersonPrincipalsSerializer(serializers.ModelSerializer):
@@ -73,15 +87,40 @@ class CrewSerializer(serializers.ModelSerializer):
     """
     Serializer, for Crew model belonging to a specific Title instance. Does
     not include the redundant `Title` object in the serialized data.
+
+    Only the first MAX_DETAIL_CREW writers and directors, in the order they
+    were added, are included, each list read with one query. The full cast
+    and crew is paginated by the TitlePrincipals view.
     """
 
-    writers = BasicPersonSerializer(many=True)
-    directors = BasicPersonSerializer(many=True)
+    writers = serializers.SerializerMethodField()
+    directors = serializers.SerializerMethodField()
 
     class Meta:
         model = Crew
         fields = ["writers", "directors"]
 
+    def get_members(self, instance, field):
+        through = getattr(Crew, field).through
+        members = (
+            through.objects.filter(crew=instance)
+            .select_related("person")
+            .only(*get_related_fields("person", BasicPersonSerializer))
+            .order_by("id")[:MAX_DETAIL_CREW]
+        )
+
+        return BasicPersonSerializer(
+            [member.person for member in members],
+            many=True,
+            context=self.context,
+        ).data
+
+    def get_writers(self, instance):
+        return self.get_members(instance, "writers")
+
+    def get_directors(self, instance):
+        return self.get_members(instance, "directors")
+
 
 class TitleSerializer(serializers.ModelSerializer):
     """
@@ -94,6 +133,7 @@ class TitleSerializer(serializers.ModelSerializer):
     rating = serializers.DecimalField(max_digits=3, decimal_places=1)
     rating_count = serializers.IntegerField()
     type = SimpleNameAndIdSerializer()
+    image_renditions = ImageRenditionsField(source="image")
 
     class Meta:
         model = Title
@@ -111,18 +151,22 @@ class TitleSerializer(serializers.ModelSerializer):
             "rating",
             "rating_count",
             "image",
+            "image_renditions",
             "description",
         ]
 
 
 class PersonSerializer(serializers.ModelSerializer):
     """
-    Serializer for Person model, in PersonDetail view.
+    Serializer for Person model, in PersonDetail view. Includes the number
+    of titles per category instead of the whole filmography, which is
+    paginated by the PersonFilmography view.
     """
 
     known_for_titles = BasicTitleSerializer(many=True)
     professions = SimpleNameSerializer(many=True)
-    filmography = PersonPrincipalsSerializer(many=True)
+    filmography_summary = serializers.SerializerMethodField()
+    image_renditions = ImageRenditionsField(source="image")
 
     class Meta:
         model = Person
@@ -133,11 +177,19 @@ class PersonSerializer(serializers.ModelSerializer):
             "death_year",
             "known_for_titles",
             "professions",
-            "filmography",
+            "filmography_summary",
             "image",
+            "image_renditions",
             "description",
         ]
 
+    def get_filmography_summary(self, instance):
+        return list(
+            instance.filmography.order_by("category")
+            .values("category")
+            .annotate(count=Count("id"))
+        )
+
 
 class ReviewSerializer(serializers.ModelSerializer):
     """
@@ -1,7 +1,27 @@
-from django.db.models.signals import post_save
+from django.db.models import Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
 from django.dispatch import receiver
 
-from .models import ActivityLog, Rating, Review
+from common.images import create_image_renditions
+
+from .cache import in_catalog_update, invalidate_objects
+from .flags import get_changed_flag_mask_pks, remove_flag_bit
+from .models import (
+    ActivityLog,
+    Crew,
+    Genre,
+    Person,
+    Principal,
+    Profession,
+    Rating,
+    Review,
+    Title,
+)
 
 
 @receiver(post_save, sender=Rating)
@@ -17,6 +37,7 @@ def add_rating(sender, instance, created, **kwargs):
         action=action,
         rating=instance,
     )
+    Title.objects.update_rating_aggregates([instance.title_id])
 
 
 @receiver(post_save, sender=Review)
@@ -32,3 +53,187 @@ def add_review(sender, instance, created, **kwargs):
         action=action,
         review=instance,
     )
+
+
+@receiver(m2m_changed, sender=Title.genres.through)
+def update_genre_mask(sender, instance, action, reverse, pk_set, **kwargs):
+
+    # Ingested titles are created with their genre mask
+    if in_catalog_update():
+        return
+
+    title_ids = get_changed_flag_mask_pks(
+        Title, "genres", instance, action, reverse, pk_set
+    )
+    if title_ids:
+        Title.objects.update_genre_masks(title_ids)
+
+
+@receiver(m2m_changed, sender=Person.professions.through)
+def update_profession_mask(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+
+    # Ingested people are created with their profession mask
+    if in_catalog_update():
+        return
+
+    person_ids = get_changed_flag_mask_pks(
+        Person, "professions", instance, action, reverse, pk_set
+    )
+    if person_ids:
+        Person.objects.update_profession_masks(person_ids)
+
+
+@receiver(m2m_changed, sender=Title.watchlist_set.through)
+@receiver(m2m_changed, sender=Title.favorites_set.through)
+def update_list_popularity(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+
+    if action == "pre_clear" and not reverse:
+        instance._cleared_title_ids = list(
+            sender.objects.filter(user=instance).values_list(
+                "title", flat=True
+            )
+        )
+        return
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if reverse:
+        title_ids = [instance.id]
+    elif action == "post_clear":
+        title_ids = getattr(instance, "_cleared_title_ids", [])
+    else:
+        title_ids = pk_set
+
+    Title.objects.update_popularity(title_ids)
+
+
+@receiver(pre_delete, sender=Genre)
+def remove_genre_bit(sender, instance, **kwargs):
+    remove_flag_bit(Title, "genre_mask", instance)
+
+
+@receiver(pre_delete, sender=Profession)
+def remove_profession_bit(sender, instance, **kwargs):
+    remove_flag_bit(Person, "profession_mask", instance)
+
+
+@receiver(post_save, sender=Title)
+def update_principal_years(sender, instance, created, update_fields, **kwargs):
+
+    if created or (update_fields and "start_year" not in update_fields):
+        return
+
+    Principal.objects.filter(title=instance).exclude(
+        start_year=instance.start_year
+    ).update(start_year=instance.start_year)
+
+
+post_save.connect(create_image_renditions, sender=Title)
+post_save.connect(create_image_renditions, sender=Person)
+
+
+def get_title_person_ids(title):
+    """
+    Returns the ids of the people whose detail responses embed a title,
+    as one of their known for titles.
+    """
+
+    return (
+        Person.known_for_titles.through.objects.filter(title=title)
+        .order_by()
+        .values_list("person_id", flat=True)
+    )
+
+
+def get_person_title_ids(person):
+    """
+    Returns the ids of the titles whose detail responses embed a person, as
+    a principal, writer or director.
+    """
+
+    principals = (
+        Principal.objects.filter(person=person)
+        .order_by()
+        .values_list("title_id", flat=True)
+    )
+    crew = (
+        Crew.objects.filter(Q(writers=person) | Q(directors=person))
+        .order_by()
+        .values_list("title_id", flat=True)
+    )
+
+    return principals.union(crew)
+
+
+@receiver(pre_delete, sender=Title)
+def collect_title_people(sender, instance, **kwargs):
+    instance._related_person_ids = list(get_title_person_ids(instance))
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def invalidate_title(sender, instance, **kwargs):
+    invalidate_objects("title", [instance.pk])
+    invalidate_objects(
+        "person",
+        getattr(
+            instance,
+            "_related_person_ids",
+            get_title_person_ids(instance),
+        ),
+    )
+
+
+@receiver(pre_delete, sender=Person)
+def collect_person_titles(sender, instance, **kwargs):
+    instance._related_title_ids = list(get_person_title_ids(instance))
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def invalidate_person(sender, instance, **kwargs):
+    invalidate_objects("person", [instance.pk])
+    invalidate_objects(
+        "title",
+        getattr(
+            instance,
+            "_related_title_ids",
+            get_person_title_ids(instance),
+        ),
+    )
+
+
+@receiver(post_save, sender=Principal)
+@receiver(post_delete, sender=Principal)
+def invalidate_principal(sender, instance, **kwargs):
+    invalidate_objects("title", [instance.title_id])
+    invalidate_objects("person", [instance.person_id])
+
+
+@receiver(post_save, sender=Crew)
+@receiver(post_delete, sender=Crew)
+def invalidate_crew(sender, instance, **kwargs):
+    invalidate_objects("title", [instance.title_id])
+
+
+@receiver(m2m_changed, sender=Title.genres.through)
+@receiver(m2m_changed, sender=Crew.writers.through)
+@receiver(m2m_changed, sender=Crew.directors.through)
+@receiver(m2m_changed, sender=Person.professions.through)
+@receiver(m2m_changed, sender=Person.known_for_titles.through)
+def invalidate_related(sender, instance, action, reverse, **kwargs):
+
+    if action not in ("post_add", "post_remove", "post_clear") or reverse:
+        return
+
+    if isinstance(instance, Crew):
+        invalidate_objects("title", [instance.title_id])
+    elif isinstance(instance, Person):
+        invalidate_objects("person", [instance.pk])
+    else:
+        invalidate_objects("title", [instance.pk])
@@ -1,3 +1,1365 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from common.images import get_rendition_name
+from common.pagination import KeysetPagination
+from common.utils import normalize_name
+from common.values import get_values_serializer
+from tsv.helpers import parse_basics
+
+from . import autocomplete
+from . import cache as catalog_cache
+from .cache import SEARCH_VERSION, bump_version
+from .models import (
+    ActivityLog,
+    Crew,
+    Genre,
+    Person,
+    Principal,
+    Profession,
+    Rating,
+    Review,
+    Title,
+    TitleName,
+    TitleType,
+)
+from .serializers import (
+    MAX_DETAIL_CREW,
+    BasicPersonSerializer,
+    BasicTitleSerializer,
+)
+from .views import MAX_DETAIL_PRINCIPALS, MAX_MULTI_GET_IDS
+
+logging.disable(logging.CRITICAL)
+User = get_user_model()
+client_user_data = {
+    "first_name": "Test",
+    "last_name": "Case",
+    "email": "client@test.com",
+    "password": "1234",
+    "age": 18,
+    "country": "PK",
+}
+
+
+def create_authenticated_user(client):
+    """
+    Creates an active user and sets the client's authentication header.
+    """
+
+    user = User.objects.create_user(**client_user_data)
+    user.is_active = True
+    user.save()
+
+    refresh = RefreshToken.for_user(user)
+    client.credentials(
+        HTTP_AUTHORIZATION="Bearer " + str(refresh.access_token)
+    )
+    return user
+
+
+class BulkRatingImport(APITestCase):
+    """
+    Tests importing ratings in bulk from a JSON list or CSV file.
+    """
+
+    url = reverse("bulk-rate-titles")
+
+    def setUp(self):
+        self.user = create_authenticated_user(self.client)
+        for title_id in range(1, 4):
+            Title.objects.create(id=title_id, name=f"Title {title_id}")
+
+    def test_json_import(self):
+        Rating.objects.create(user=self.user, title_id=1, rating=2)
+        log_count = ActivityLog.objects.count()
+
+        data = {
+            "ratings": [
+                {"id": "tt0000001", "rating": 8},
+                {"id": 2, "rating": 6},
+                {"id": 99, "rating": 6},
+                {"id": 3, "rating": 11},
+            ]
+        }
+        response = self.client.post(self.url, data, format="json")
+        content = json.loads(response.content)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert content["imported"] == 2
+        assert content["skipped"] == 2
+        assert Rating.objects.filter(outdated=False).count() == 2
+        assert ActivityLog.objects.count() == log_count + 1
+
+        title = Title.objects.get(id=1)
+        assert title.rating == 8
+        assert title.rating_count == 1
+
+    def test_non_integer_ratings(self):
+        data = {
+            "ratings": [
+                {"id": 1, "rating": 7.9},
+                {"id": 1, "rating": "7.9"},
+                {"id": 2, "rating": True},
+                {"id": 2, "rating": None},
+                {"id": 3, "rating": "7"},
+            ]
+        }
+        response = self.client.post(self.url, data, format="json")
+        content = json.loads(response.content)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert content["imported"] == 1
+        assert content["skipped"] == 4
+        assert Title.objects.get(id=3).rating == 7
+
+    def test_csv_import(self):
+        file = SimpleUploadedFile(
+            "ratings.csv", b"Const,Your Rating\ntt0000001,7\ntt0000002,9\n"
+        )
+        response = self.client.post(self.url, {"file": file})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert Title.objects.get(id=2).rating == 9
+
+    def test_missing_ratings(self):
+        response = self.client.post(self.url, {}, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TitleNameSearch(APITestCase):
+    """
+    Tests word-prefix matching and relevance ranking of TitleSearch.
+    """
+
+    url = reverse("search-title")
+
+    def setUp(self):
+        names = ["The Shawshank Redemption", "Redshaw", "Shawshank"]
+        for title_id, name in enumerate(names, start=1):
+            Title.objects.create(id=title_id, name=name)
+
+    def search(self, name):
+        response = self.client.get(self.url, {"name": name})
+        assert response.status_code == status.HTTP_200_OK
+        return [title["name"] for title in response.data["results"]]
+
+    def test_word_prefix_match(self):
+        assert self.search("shaw rede") == ["The Shawshank Redemption"]
+
+    def test_alternate_title_match(self):
+        TitleName.objects.create(title_id=2, name="Les Évadés")
+        TitleName.objects.create(title_id=2, name="Les Evadés (1994)")
+
+        assert self.search("les evad") == ["Redshaw"]
+
+    def test_query_without_words(self):
+        assert self.search("!!!") == []
+
+        response = self.client.get(reverse("search-person"), {"search": "!!"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"] == []
+
+    def test_relevance_ranking(self):
+        assert self.search("shawshank") == [
+            "Shawshank",
+            "The Shawshank Redemption",
+        ]
+
+
+class AutocompleteSuggestions(APITestCase):
+    """
+    Tests building the autocomplete index and retrieving suggestions.
+    """
+
+    url = reverse("autocomplete")
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "autocomplete.idx")
+
+        settings_override = override_settings(
+            AUTOCOMPLETE_INDEX_PATH=self.path
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        Title.objects.create(id=1, name="Amélie", start_year="2001")
+        Title.objects.create(id=2, name="American Beauty", popularity=5)
+        Person.objects.create(id=1, name="Amy Adams")
+
+    def suggest(self, query):
+        response = self.client.get(self.url, {"q": query})
+        assert response.status_code == status.HTTP_200_OK
+        return [(item["type"], item["id"]) for item in response.data]
+
+    def test_missing_index(self):
+        assert self.suggest("am") == []
+
+    def test_prefix_suggestions(self):
+        autocomplete.build_autocomplete_index()
+
+        assert self.suggest("AME") == [("title", 2), ("title", 1)]
+        assert self.suggest("amy a") == [("person", 1)]
+        assert self.suggest("b") == []
+
+    def test_popular_prefix_suggestions(self):
+        with mock.patch.object(autocomplete, "SCAN_LIMIT", 1):
+            autocomplete.build_autocomplete_index()
+
+        assert self.suggest("am")[0] == ("title", 2)
+        assert len(self.suggest("am")) == 3
+
+    def test_fuzzy_search(self):
+        Title.objects.create(id=3, name="The Shawshank Redemption")
+        Person.objects.create(id=2, name="Martin Scorsese")
+        autocomplete.build_autocomplete_index()
+
+        response = self.client.get(
+            reverse("search-title"), {"name": "shawshank redemtion"}
+        )
+        assert [title["id"] for title in response.data["results"]] == [3]
+
+        response = self.client.get(
+            reverse("search-person"), {"search": "scorcese"}
+        )
+        assert [person["id"] for person in response.data["results"]] == [2]
+
+    def test_no_fuzzy_matches(self):
+        autocomplete.build_autocomplete_index()
+
+        response = self.client.get(reverse("search-title"), {"name": "qqqq"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"] == []
+
+    def test_fuzzy_search_without_index(self):
+        response = self.client.get(reverse("search-title"), {"name": "zzzz"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"] == []
+
+        response = self.client.get(
+            reverse("search-person"), {"search": "emmma"}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["results"] == []
+
+    def test_build_runs(self):
+        Title.objects.bulk_create(
+            Title(id=title_id, name=f"Amadeus {title_id}")
+            for title_id in range(3, 40)
+        )
+        autocomplete.build_autocomplete_index()
+        with open(self.path, "rb") as file:
+            expected = file.read()
+
+        # Sorted in many small runs, merged a few files at a time
+        with mock.patch.multiple(
+            autocomplete,
+            BUILD_RUN_SIZE=5,
+            BUILD_MERGE_WIDTH=2,
+            BUILD_CHUNK_SIZE=2,
+        ):
+            autocomplete.build_autocomplete_index()
+        with open(self.path, "rb") as file:
+            assert file.read() == expected
+
+        assert os.listdir(os.path.dirname(self.path)) == ["autocomplete.idx"]
+
+    def test_reload_new_build(self):
+        autocomplete.build_autocomplete_index()
+        assert len(self.suggest("am")) == 3
+
+        Title.objects.create(id=3, name="Amadeus")
+        autocomplete.build_autocomplete_index()
+        assert len(self.suggest("am")) == 4
+
+
+class KeysetPaginationTest(APITestCase):
+    """
+    Tests that keyset pages of TitleSearch return every title exactly once,
+    in the same order as page number pagination.
+    """
+
+    url = reverse("search-title")
+
+    def setUp(self):
+        cache.clear()
+        for title_id in range(1, 46):
+            rating = None if title_id % 3 == 0 else title_id % 4
+            Title.objects.create(
+                id=title_id,
+                name=f"Title {title_id}",
+                start_year=str(2000 + title_id % 5),
+                rating=rating,
+            )
+
+    def get_ids(self, response):
+        assert response.status_code == status.HTTP_200_OK
+        return [title["id"] for title in response.data["results"]]
+
+    def test_cursor_pages(self):
+        expected = []
+        for page in range(1, 4):
+            response = self.client.get(self.url, {"page": page})
+            expected += self.get_ids(response)
+
+        ids = []
+        response = self.client.get(self.url, {"cursor": ""})
+        while True:
+            ids += self.get_ids(response)
+            assert "count" not in response.data
+            if response.data["next"] is None:
+                break
+            response = self.client.get(response.data["next"])
+
+        assert ids == expected
+        assert len(ids) == 45
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "invalid"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        cursor = KeysetPagination().encode_cursor(["x"])
+        response = self.client.get(
+            reverse("title-reviews", args=[1]), {"cursor": cursor}
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_datetime_cursor(self):
+        user = create_authenticated_user(self.client)
+        created_at = timezone.now().replace(microsecond=0)
+        for offset in range(30):
+            log = ActivityLog.objects.create(
+                user=user, title_id=1, action="rate"
+            )
+            ActivityLog.objects.filter(id=log.id).update(
+                created_at=created_at + timedelta(microseconds=offset)
+            )
+
+        times = []
+        response = self.client.get(reverse("timeline"), {"cursor": ""})
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            times += [log["created_at"] for log in response.data["results"]]
+            if response.data["next"] is None:
+                break
+            response = self.client.get(response.data["next"])
+
+        assert len(times) == len(set(times)) == 30
+
+
+class CachedCountTest(APITestCase):
+    """
+    Tests that search counts are served from the cache, and other
+    paginated counts are exact.
+    """
+
+    url = reverse("search-title")
+
+    def setUp(self):
+        cache.clear()
+        for title_id in range(1, 4):
+            Title.objects.create(id=title_id, name=f"Title {title_id}")
+
+    def get_count(self):
+        response = self.client.get(self.url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count_is_estimate"] is False
+        return response.data["count"]
+
+    def test_cached_count(self):
+        assert self.get_count() == 3
+
+        Title.objects.create(id=4, name="Title 4")
+        assert self.get_count() == 3
+
+        cache.clear()
+        assert self.get_count() == 4
+
+    def test_exact_count(self):
+        user = create_authenticated_user(self.client)
+        url = reverse("title-reviews", args=[1])
+        for _ in range(20):
+            Review.objects.create(user=user, title_id=1, review="Review")
+
+        response = self.client.get(url)
+        assert response.data["count"] == 20
+        assert response.data["next"] is None
+
+        for _ in range(5):
+            Review.objects.create(user=user, title_id=1, review="Review")
+
+        response = self.client.get(url)
+        assert response.data["count"] == 25
+        assert response.data["count_is_estimate"] is False
+        assert response.data["next"] is not None
+
+        response = self.client.get(url, {"page": 2})
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 5
+
+
+class GenreFilterTest(APITestCase):
+    """
+    Tests maintaining the genre bitmask and filtering TitleSearch by genre.
+    """
+
+    url = reverse("search-title")
+
+    def setUp(self):
+        cache.clear()
+        self.drama = Genre.objects.create(name="Drama")
+        self.crime = Genre.objects.create(name="Crime")
+
+        Title.objects.create(id=1, name="Drama").genres.add(self.drama)
+        Title.objects.create(id=2, name="Both").genres.add(
+            self.drama, self.crime
+        )
+        Title.objects.create(id=3, name="Neither")
+
+    def search(self, params):
+        response = self.client.get(self.url, params)
+        assert response.status_code == status.HTTP_200_OK
+        return sorted(title["id"] for title in response.data["results"])
+
+    def test_genre_mask_signal(self):
+        title = Title.objects.get(id=2)
+        assert title.genre_mask == self.drama.flag | self.crime.flag
+
+        title.genres.remove(self.drama)
+        assert Title.objects.get(id=2).genre_mask == self.crime.flag
+
+        self.crime.genres.clear()
+        assert Title.objects.get(id=2).genre_mask == 0
+
+    def test_any_genre(self):
+        assert self.search({"genre": ["Drama", "Crime"]}) == [1, 2]
+        assert self.search({"genre": ["Unknown"]}) == []
+
+    def test_all_genres(self):
+        params = {"genre": ["Drama", "Crime"], "genre_match": "all"}
+        assert self.search(params) == [2]
+
+    def test_delete_genre(self):
+        self.drama.delete()
+        assert Title.objects.get(id=1).genre_mask == 0
+        assert Title.objects.get(id=2).genre_mask == self.crime.flag
+
+    def test_ingested_genre_mask(self):
+        rows = [
+            ["tt0000004", "movie", "Heat", "Heat", "0", "1995", "\\N", "170"]
+            + ["Crime,Drama"],
+            ["tt0000005", "movie", "Up", "Up", "0", "2009", "\\N", "96"]
+            + ["Animation"],
+        ]
+
+        with mock.patch.object(
+            Title.objects, "update_genre_masks"
+        ) as update, catalog_cache.catalog_update():
+            parse_basics(iter(rows))
+
+        update.assert_not_called()
+        animation = Genre.objects.get(name="Animation")
+        assert Title.objects.get(id=4).genre_mask == (
+            self.drama.flag | self.crime.flag
+        )
+        assert Title.objects.get(id=5).genre_mask == animation.flag
+
+
+class TitleFacetsTest(APITestCase):
+    """
+    Tests genre, decade and type counts of TitleSearch.
+    """
+
+    url = reverse("search-title")
+
+    def setUp(self):
+        cache.clear()
+        drama = Genre.objects.create(name="Drama")
+        crime = Genre.objects.create(name="Crime")
+        movie = TitleType.objects.create(name="movie")
+
+        Title.objects.create(
+            id=1, name="First", start_year=1994, type=movie
+        ).genres.add(drama, crime)
+        Title.objects.create(id=2, name="Second", start_year=1999).genres.add(
+            drama
+        )
+        Title.objects.create(id=3, name="Third", start_year=2008)
+
+    def get_facets(self, params):
+        response = self.client.get(self.url, {"facets": "true", **params})
+        assert response.status_code == status.HTTP_200_OK
+        return response.data["facets"]
+
+    def test_facet_counts(self):
+        assert self.get_facets({}) == {
+            "genres": {"Drama": 2, "Crime": 1},
+            "decades": {"1990s": 2, "2000s": 1},
+            "types": {"movie": 1},
+        }
+
+    def test_filtered_facet_counts(self):
+        facets = self.get_facets({"genre": "Crime"})
+        assert facets["genres"] == {"Drama": 1, "Crime": 1}
+        assert facets["decades"] == {"1990s": 1}
+
+    def test_facets_not_requested(self):
+        response = self.client.get(self.url)
+        assert "facets" not in response.data
+
+    def test_cached_facets(self):
+        params = {"genre": "Drama", "min_year": 1990}
+        facets = self.get_facets(params)
+
+        # Only the page of cached result ids is read
+        with self.assertNumQueries(1):
+            assert self.get_facets(params) == facets
+
+        Title.objects.create(id=4, name="Fourth", start_year=1995).genres.add(
+            Genre.objects.get(name="Drama")
+        )
+        assert self.get_facets(params) == facets
+
+        bump_version(SEARCH_VERSION)
+        assert self.get_facets(params)["decades"] == {"1990s": 3}
+
+
+class NormalizedNameTest(APITestCase):
+    """
+    Tests maintaining `normalized_name` and searching people by the
+    prefixes of its words.
+    """
+
+    url = reverse("search-person")
+
+    def setUp(self):
+        cache.clear()
+        Person.objects.create(id=1, name="Zoë Saldaña")
+        Person.objects.create(id=2, name="Zoe Kazan")
+        Person.objects.create(id=3, name="Adam Sandler")
+
+    def search(self, query):
+        response = self.client.get(self.url, {"search": query})
+        assert response.status_code == status.HTTP_200_OK
+        return [person["id"] for person in response.data["results"]]
+
+    def test_normalized_on_save(self):
+        person = Person.objects.get(id=1)
+        assert person.normalized_name == "zoe saldana"
+
+        person.name = "Zoë Yadira Saldaña-Nazario"
+        person.save(update_fields=["name"])
+        person.refresh_from_db()
+        assert person.normalized_name == "zoe yadira saldana nazario"
+
+    def test_prefix_search(self):
+        assert self.search("ZOE") == [2, 1]
+        assert self.search("zoë sal") == [1]
+
+    def test_word_prefix_search(self):
+        assert self.search("saldana") == [1]
+        assert self.search("kaz zoe") == [2]
+
+    def test_admin_word_prefix_search(self):
+        admin = User.objects.create_superuser(**client_user_data)
+        self.client.force_login(admin)
+
+        url = reverse("admin:core_person_changelist")
+        response = self.client.get(url, {"q": "Sandler"})
+        assert response.status_code == status.HTTP_200_OK
+        assert [
+            person.id for person in response.context["cl"].result_list
+        ] == [3]
+
+
+class TitleSortTest(APITestCase):
+    """
+    Tests the sort modes of TitleSearch and maintaining title popularity.
+    """
+
+    url = reverse("search-title")
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_authenticated_user(self.client)
+        Title.objects.create(id=1, name="Beta", runtime_minutes=90)
+        Title.objects.create(id=2, name="Alpha", runtime_minutes=120)
+        Title.objects.create(id=3, name="Gamma", runtime_minutes=100)
+
+    def search(self, sort):
+        response = self.client.get(self.url, {"sort": sort})
+        assert response.status_code == status.HTTP_200_OK
+        return [title["id"] for title in response.data["results"]]
+
+    def test_sort_modes(self):
+        assert self.search("name") == [2, 1, 3]
+        assert self.search("-runtime") == [2, 3, 1]
+
+    def test_unknown_sort(self):
+        response = self.client.get(self.url, {"sort": "-genres__name"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_popularity(self):
+        self.user.watchlist.add(3)
+        self.user.favorites.add(1)
+        Rating.objects.create(user=self.user, title_id=1, rating=5)
+        assert self.search("-popularity") == [1, 3, 2]
+
+        self.user.favorites.clear()
+        assert Title.objects.get(id=1).popularity == 1
+        assert Title.objects.get(id=3).popularity == 1
+
+    def test_popularity_keeps_cached_results(self):
+        assert self.search("-popularity") == [3, 2, 1]
+        self.user.watchlist.add(1)
+        Rating.objects.create(user=self.user, title_id=2, rating=5)
+
+        # Served from the cache until it expires
+        with self.assertNumQueries(2):
+            assert self.search("-popularity") == [3, 2, 1]
+
+
+class SearchResultsCacheTest(APITestCase):
+    """
+    Tests serving search pages from the cache of result ids.
+    """
+
+    url = reverse("search-title")
+
+    def setUp(self):
+        cache.clear()
+        for title_id in range(1, 4):
+            Title.objects.create(id=title_id, name=f"Title {title_id}")
+
+    def search(self, params):
+        response = self.client.get(self.url, params)
+        assert response.status_code == status.HTTP_200_OK
+        return [title["id"] for title in response.data["results"]]
+
+    def test_cached_results(self):
+        ids = self.search({"sort": "name"})
+        Title.objects.create(id=4, name="Title 0")
+
+        with self.assertNumQueries(1):
+            assert self.search({"sort": "name", "page": 1}) == ids
+
+    def test_normalized_params(self):
+        ids = self.search({"name": "Títle"})
+
+        with self.assertNumQueries(1):
+            assert self.search({"name": "title", "page": 1}) == ids
+
+    def test_version_invalidation(self):
+        self.search({"sort": "name"})
+        Title.objects.create(id=4, name="Title 0")
+        bump_version(SEARCH_VERSION)
+
+        assert self.search({"sort": "name"})[0] == 4
+
+    def test_rating_invalidation(self):
+        user = User.objects.create_user(**client_user_data)
+        assert self.search({"min_rating": 5}) == []
+        ids = self.search({"sort": "name"})
+
+        Rating.objects.create(user=user, title_id=2, rating=9)
+        assert self.search({"min_rating": 5}) == [2]
+        assert self.search({"sort": "-rating"})[0] == 2
+
+        with self.assertNumQueries(1):
+            assert self.search({"sort": "name"}) == ids
+
+    def test_person_search_normalized_params(self):
+        Person.objects.create(id=1, name="Zoë Kazan")
+        url = reverse("search-person")
+        response = self.client.get(url, {"search": "Zoë"})
+        Person.objects.create(id=2, name="Zoe Saldana")
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, {"search": "zoe", "page": 1})
+        assert cached.data["results"] == response.data["results"]
+
+
+class PersonFilterTest(APITestCase):
+    """
+    Tests maintaining the profession bitmask and filtering PersonSearch by
+    profession and birth year.
+    """
+
+    url = reverse("search-person")
+
+    def setUp(self):
+        cache.clear()
+        self.actress = Profession.objects.create(name="actress")
+        self.writer = Profession.objects.create(name="writer")
+
+        Person.objects.create(
+            id=1, name="Emma Stone", birth_year=1988
+        ).professions.add(self.actress)
+        Person.objects.create(
+            id=2, name="Emma Thompson", birth_year=1959
+        ).professions.add(self.actress, self.writer)
+        Person.objects.create(id=3, name="Emma Watson", birth_year=1990)
+
+    def search(self, params):
+        response = self.client.get(self.url, params)
+        assert response.status_code == status.HTTP_200_OK
+        return [person["id"] for person in response.data["results"]]
+
+    def test_profession_mask_signal(self):
+        person = Person.objects.get(id=2)
+        assert person.profession_mask == (self.actress.flag | self.writer.flag)
+
+        person.professions.remove(self.writer)
+        assert Person.objects.get(id=2).profession_mask == self.actress.flag
+
+        self.writer.delete()
+        self.actress.delete()
+        assert Person.objects.get(id=1).profession_mask == 0
+
+    def test_profession_and_year_filters(self):
+        params = {
+            "search": "emma",
+            "profession": "actress",
+            "min_birth_year": 1980,
+        }
+        assert self.search(params) == [1]
+
+        params = {
+            "profession": ["actress", "writer"],
+            "profession_match": "all",
+        }
+        assert self.search(params) == [2]
+
+    def test_invalid_birth_year(self):
+        response = self.client.get(self.url, {"max_birth_year": "old"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class DetailQueryCountTest(APITestCase):
+    """
+    Tests that TitleDetail and PersonDetail run a fixed number of queries,
+    however many principals and crew members a title has.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.title = Title.objects.create(id=1, name="Epic")
+        self.title.genres.add(Genre.objects.create(name="Drama"))
+        crew = Crew.objects.create(title=self.title)
+
+        people = Person.objects.bulk_create(
+            [
+                Person(id=index, name=f"Person {index}")
+                for index in range(1, 301)
+            ]
+        )
+        Principal.objects.bulk_create(
+            [
+                Principal(
+                    title=self.title,
+                    person=person,
+                    category="actor",
+                    billing_order=index,
+                )
+                for index, person in enumerate(people, 1)
+            ]
+        )
+        crew.writers.add(*people[:50])
+        crew.directors.add(*people[:5])
+
+        for title_id in range(2, 202):
+            Principal.objects.create(
+                title=Title.objects.create(id=title_id, name=f"T {title_id}"),
+                person=people[0],
+                category="actor",
+            )
+
+    def test_title_detail_queries(self):
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("title", args=[1]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["principals"]) == MAX_DETAIL_PRINCIPALS
+        writers = response.data["crew"]["writers"]
+        assert [writer["id"] for writer in writers] == list(
+            range(1, MAX_DETAIL_CREW + 1)
+        )
+        assert len(response.data["crew"]["directors"]) == 5
+
+    def test_person_detail_queries(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("person", args=[1]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["filmography_summary"] == [
+            {"category": "actor", "count": 201}
+        ]
+
+
+class TitlePrincipalsTest(APITestCase):
+    """
+    Tests that TitleDetail includes the top billed principals, and that the
+    full cast is paginated in billing order.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.title = Title.objects.create(id=1, name="Epic")
+
+        for person_id in range(1, MAX_DETAIL_PRINCIPALS + 3):
+            Principal.objects.create(
+                title=self.title,
+                person=Person.objects.create(
+                    id=person_id, name=f"P {person_id}"
+                ),
+                category="actor",
+            )
+
+        # Billed first, although created last
+        Principal.objects.filter(person=MAX_DETAIL_PRINCIPALS + 2).update(
+            billing_order=0
+        )
+
+    def get_ids(self, rows):
+        return [row["person"]["id"] for row in rows]
+
+    def test_billing_order_on_save(self):
+        orders = Principal.objects.order_by("id").values_list(
+            "billing_order", flat=True
+        )
+        assert list(orders)[:3] == [1, 2, 3]
+
+    def test_top_billed_principals(self):
+        response = self.client.get(reverse("title", args=[1]))
+        assert response.status_code == status.HTTP_200_OK
+
+        principals = response.data["principals"]
+        assert self.get_ids(principals) == [
+            MAX_DETAIL_PRINCIPALS + 2,
+            *range(1, MAX_DETAIL_PRINCIPALS + 1),
+        ]
+
+    def test_full_cast(self):
+        url = reverse("title-principals", args=[1])
+
+        with mock.patch.object(KeysetPagination, "page_size", 8):
+            response = self.client.get(url, {"cursor": ""})
+            ids = self.get_ids(response.data["results"])
+            response = self.client.get(response.data["next"])
+            ids += self.get_ids(response.data["results"])
+
+        assert ids == [
+            MAX_DETAIL_PRINCIPALS + 2,
+            *range(1, MAX_DETAIL_PRINCIPALS + 2),
+        ]
+        assert response.data["next"] is None
+
+
+class MultiGetTest(APITestCase):
+    """
+    Tests the basic information of several titles and people, read in one
+    query or from the cached detail responses.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("titles")
+
+        for title_id in range(1, 4):
+            Title.objects.create(
+                id=title_id, name=f"T {title_id}", start_year=2000
+            )
+        Title.objects.filter(id=2).update(rating=7.5, rating_count=1)
+        Person.objects.create(id=1, name="Actor")
+        Person.objects.create(id=2, name="Director")
+
+    def get_titles(self, ids):
+        response = self.client.get(self.url, {"ids": ids})
+        assert response.status_code == status.HTTP_200_OK
+        return response.data
+
+    def test_request_order(self):
+        with self.assertNumQueries(1):
+            titles = self.get_titles("3,99,1,3")
+
+        assert [title["id"] for title in titles] == [3, 1]
+        assert titles[0]["name"] == "T 3"
+
+    def test_cached_details(self):
+        cold = self.get_titles("1,2,3")
+
+        self.client.get(reverse("title", args=[1]))
+        self.client.get(reverse("title", args=[2]))
+        with self.assertNumQueries(1):
+            assert self.get_titles("1,2,3") == cold
+
+        self.client.get(reverse("title", args=[3]))
+        with self.assertNumQueries(0):
+            assert self.get_titles("1,2,3") == cold
+
+    def test_people(self):
+        response = self.client.get(reverse("people"), {"ids": "2,1"})
+        assert [person["name"] for person in response.data] == [
+            "Director",
+            "Actor",
+        ]
+
+    def test_invalid_ids(self):
+        response = self.client.get(self.url, {"ids": "1,one"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        ids = ",".join(str(pk) for pk in range(MAX_MULTI_GET_IDS + 1))
+        response = self.client.get(self.url, {"ids": ids})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class SparseFieldsetsTest(APITestCase):
+    """
+    Tests that the `fields`, `expand` and `exclude` params prune the
+    serialized fields, and the relations read for them.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.title = Title.objects.create(id=1, name="Epic", start_year=2000)
+        self.title.genres.add(Genre.objects.create(name="Drama"))
+        self.person = Person.objects.create(id=1, name="Actor")
+        Principal.objects.create(
+            title=self.title, person=self.person, category="actor"
+        )
+        self.url = reverse("title", args=[1])
+
+    def get_title(self, params):
+        response = self.client.get(self.url, params)
+        assert response.status_code == status.HTTP_200_OK
+        return response
+
+    def test_fields(self):
+        # One query for the validators, and one for the title
+        with self.assertNumQueries(2):
+            response = self.get_title({"fields": "id,name"})
+
+        assert response.data == {"id": 1, "name": "Epic"}
+
+    def test_expand(self):
+        with self.assertNumQueries(3):
+            data = self.get_title({"expand": "genres"}).data
+
+        assert data["genres"] == [{"name": "Drama"}]
+        assert data["start_year"] == 2000
+        assert "principals" not in data
+        assert "type" not in data
+
+        data = self.get_title({"fields": "name", "expand": "principals"}).data
+        assert list(data) == ["name", "principals"]
+
+    def test_exclude(self):
+        data = self.get_title({"exclude": "principals,crew"}).data
+        assert "principals" not in data
+        assert "crew" not in data
+        assert data["genres"] == [{"name": "Drama"}]
+
+    def test_cached_detail(self):
+        etag = self.get_title({})["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.get_title({"fields": "id,name"})
+
+        assert response.data == {"id": 1, "name": "Epic"}
+        assert response["ETag"] != etag
+
+    def test_unknown_field(self):
+        response = self.client.get(self.url, {"fields": "id,budget"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_list_fields(self):
+        response = self.client.get(
+            reverse("person-filmography", args=[1]), {"fields": "category"}
+        )
+        assert response.data["results"] == [{"category": "actor"}]
+
+        response = self.client.get(
+            reverse("search-title"), {"fields": "id,name"}
+        )
+        assert response.data["results"] == [{"id": 1, "name": "Epic"}]
+
+
+class ValuesSerializerTest(APITestCase):
+    """
+    Tests that list endpoints which serialize values return the same bytes
+    as the model serializers.
+    """
+
+    def setUp(self):
+        self.request = APIRequestFactory().get("/")
+        self.user = create_authenticated_user(self.client)
+
+        for title_id, name, rating in [
+            (1, "Amélie", 8.34),
+            (2, "Epic \u2028 Line", None),
+            (3, "Heat", 7),
+        ]:
+            Title.objects.create(id=title_id, name=name, start_year=2001)
+            Title.objects.filter(id=title_id).update(
+                rating=rating, rating_count=1
+            )
+        Title.objects.filter(id=1).update(image="title/poster.jpg")
+        Person.objects.create(id=1, name="Zoë", image="person/zoe.jpg")
+        Person.objects.create(id=2, name="Ann", birth_year=1950)
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def render_serializer(self, serializer_class, queryset):
+        context = {"request": self.request}
+        model_data = serializer_class(queryset, many=True, context=context)
+        values_serializer = get_values_serializer(serializer_class)
+        values_data = values_serializer.serialize(
+            values_serializer.values(queryset), context
+        )
+
+        assert self.render(values_data) == self.render(model_data.data)
+        return values_data
+
+    def test_identical_output(self):
+        titles = Title.objects.order_by("id")
+        data = self.render_serializer(BasicTitleSerializer, titles)
+        assert data[0]["image"] == "http://testserver/media/title/poster.jpg"
+        assert data[0]["rating"] == "8.3"
+        assert data[1]["rating"] is None
+
+        people = Person.objects.order_by("id")
+        data = self.render_serializer(BasicPersonSerializer, people)
+        assert data[1]["image"] is None
+
+    def test_list_endpoints(self):
+        self.user.watchlist.add(*Title.objects.all())
+        titles = Title.objects.order_by("id")
+        expected = BasicTitleSerializer(
+            titles, many=True, context={"request": self.request}
+        ).data
+
+        response = self.client.get(reverse("list-watchlist"))
+        results = sorted(response.data["results"], key=lambda row: row["id"])
+        assert self.render(results) == self.render(expected)
+
+        response = self.client.get(reverse("search-title"), {"sort": "name"})
+        expected.sort(key=lambda title: normalize_name(title["name"]))
+        assert self.render(response.data["results"]) == self.render(expected)
+
+        response = self.client.get(reverse("top_rated"))
+        assert [title["id"] for title in response.data] == [1, 3]
+
+
+class ImageRenditionsTest(APITestCase):
+    """
+    Tests creating renditions of uploaded images, and serializing their
+    URLs.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = directory.name
+
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, name, size=(1000, 1500)):
+        buffer = io.BytesIO()
+        Image.new("RGBA", size, (200, 10, 10, 255)).save(buffer, "PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+    def get_rendition_size(self, name, rendition):
+        path = os.path.join(
+            self.media_root, get_rendition_name(name, rendition)
+        )
+        with Image.open(path) as image:
+            return image.size
+
+    def test_upload(self):
+        title = Title.objects.create(
+            id=1, name="Epic", image=self.upload("poster.png")
+        )
+
+        assert self.get_rendition_size(title.image.name, "thumbnail") == (
+            92,
+            138,
+        )
+        assert self.get_rendition_size(title.image.name, "medium") == (
+            300,
+            450,
+        )
+
+        response = self.client.get(reverse("title", args=[1]))
+        renditions = response.data["image_renditions"]
+        assert renditions["thumbnail"] == (
+            "http://testserver/media/title/poster.png.thumbnail.jpg"
+        )
+
+        response = self.client.get(reverse("search-title"))
+        assert response.data["results"][0]["image_renditions"] == renditions
+
+    def test_same_root(self):
+        png = Title.objects.create(
+            id=1, name="Epic", image=self.upload("a.png")
+        )
+        jpg = Title.objects.create(
+            id=2, name="Sequel", image=self.upload("a.jpg", (50, 50))
+        )
+
+        assert self.get_rendition_size(png.image.name, "thumbnail") == (
+            92,
+            138,
+        )
+        assert self.get_rendition_size(jpg.image.name, "thumbnail") == (
+            50,
+            50,
+        )
+
+    def test_no_image(self):
+        Person.objects.create(id=1, name="Actor")
+        response = self.client.get(reverse("person", args=[1]))
+        assert response.data["image_renditions"] is None
+
+    def test_backfill_command(self):
+        person = Person.objects.create(
+            id=1, name="Actor", image=self.upload("actor.png", (50, 50))
+        )
+        thumbnail = os.path.join(
+            self.media_root, get_rendition_name(person.image.name, "thumbnail")
+        )
+        os.remove(thumbnail)
+
+        out = io.StringIO()
+        call_command("build_image_renditions", "--workers", "2", stdout=out)
+
+        assert out.getvalue() == "Created 1 renditions of 1 images\n"
+        # Small images are not scaled up
+        assert self.get_rendition_size(person.image.name, "thumbnail") == (
+            50,
+            50,
+        )
+
+
+class PersonFilmographyTest(APITestCase):
+    """
+    Tests the paginated filmography of a person, and the denormalized start
+    year it is ordered by.
+    """
+
+    def setUp(self):
+        self.person = Person.objects.create(id=1, name="Actor")
+        self.url = reverse("person-filmography", args=[1])
+
+        for title_id, year, category in [
+            (1, 1990, "actor"),
+            (2, 2010, "actor"),
+            (3, 2000, "director"),
+            (4, None, "actor"),
+        ]:
+            Principal.objects.create(
+                title=Title.objects.create(
+                    id=title_id, name=f"T {title_id}", start_year=year
+                ),
+                person=self.person,
+                category=category,
+            )
+
+    def get_ids(self, params):
+        response = self.client.get(self.url, params)
+        assert response.status_code == status.HTTP_200_OK
+        return [row["title"]["id"] for row in response.data["results"]]
+
+    def test_filmography(self):
+        assert self.get_ids({}) == [2, 3, 1, 4]
+        assert self.get_ids({"category": "actor"}) == [2, 1, 4]
+
+    def test_keyset_pages(self):
+        with mock.patch.object(KeysetPagination, "page_size", 2):
+            response = self.client.get(
+                self.url, {"cursor": "", "category": "actor"}
+            )
+        assert [row["title"]["id"] for row in response.data["results"]] == [
+            2,
+            1,
+        ]
+
+        with mock.patch.object(KeysetPagination, "page_size", 2):
+            response = self.client.get(response.data["next"])
+        assert [row["title"]["id"] for row in response.data["results"]] == [4]
+        assert response.data["next"] is None
+
+    def test_title_year_change(self):
+        title = Title.objects.get(id=4)
+        title.start_year = 2020
+        title.save()
+
+        assert self.get_ids({"category": "actor"}) == [4, 2, 1]
+
+
+class DetailCacheTest(APITestCase):
+    """
+    Tests serving detail responses from the cache, and invalidating them.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_authenticated_user(self.client)
+        self.title = Title.objects.create(id=1, name="Epic")
+        self.person = Person.objects.create(id=1, name="Actor")
+
+    def get_title(self):
+        response = self.client.get(reverse("title", args=[1]))
+        assert response.status_code == status.HTTP_200_OK
+        return response.data
+
+    def test_cached_detail(self):
+        self.get_title()
+        self.client.credentials()
+
+        # Only `updated_at` is read, for the ETag and Last-Modified headers
+        with self.assertNumQueries(1):
+            assert self.get_title()["name"] == "Epic"
+
+    def test_invalidation(self):
+        self.get_title()
+        Principal.objects.create(
+            title=self.title, person=self.person, category="actor"
+        )
+        assert len(self.get_title()["principals"]) == 1
+
+        Rating.objects.create(user=self.user, title=self.title, rating=7)
+        assert self.get_title()["rating_count"] == 1
+
+    def test_related_invalidation(self):
+        Principal.objects.create(
+            title=self.title, person=self.person, category="actor"
+        )
+        writer = Person.objects.create(id=2, name="Writer")
+        Crew.objects.create(title=self.title).writers.add(writer)
+        self.person.known_for_titles.add(self.title)
+        self.get_title()
+
+        self.person.name = "Renamed Actor"
+        self.person.save()
+        writer.name = "Renamed Writer"
+        writer.save()
+        data = self.get_title()
+        assert data["principals"][0]["person"]["name"] == "Renamed Actor"
+        assert data["crew"]["writers"][0]["name"] == "Renamed Writer"
+
+        url = reverse("person", args=[1])
+        self.client.get(url)
+        self.title.name = "Renamed"
+        self.title.save()
+        response = self.client.get(url)
+        assert response.data["known_for_titles"][0]["name"] == "Renamed"
+
+        Rating.objects.create(user=self.user, title=self.title, rating=7)
+        response = self.client.get(url)
+        assert response.data["known_for_titles"][0]["rating"] == "7.0"
+
+    def test_origin(self):
+        Title.objects.filter(id=1).update(image="title/poster.png")
+        url = reverse("title", args=[1])
+        response = self.client.get(url)
+        assert response.data["image"] == (
+            "http://testserver/media/title/poster.png"
+        )
+
+        # Media URLs are not served from the cache of another origin
+        response = self.client.get(url, secure=True)
+        assert response.data["image"] == (
+            "https://testserver/media/title/poster.png"
+        )
+        response = self.client.get(
+            reverse("titles"), {"ids": "1"}, secure=True
+        )
+        assert response.data[0]["image"] == (
+            "https://testserver/media/title/poster.png"
+        )
+
+    def test_catalog_update(self):
+        self.get_title()
+
+        with catalog_cache.catalog_update():
+            Title.objects.filter(id=1).update(name="Renamed")
+            catalog_cache.invalidate_objects("title", [1])
+            assert self.get_title()["name"] == "Epic"
+
+        assert self.get_title()["name"] == "Renamed"
+
+    def test_missing_detail(self):
+        response = self.client.get(reverse("title", args=[2]))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_conditional_get(self):
+        url = reverse("title", args=[1])
+        response = self.client.get(url)
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        last_modified = response["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        Rating.objects.create(user=self.user, title=self.title, rating=7)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+    def test_conditional_get_related(self):
+        Principal.objects.create(
+            title=self.title, person=self.person, category="actor"
+        )
+        url = reverse("title", args=[1])
+        response = self.client.get(url)
+        etag = response["ETag"]
+
+        # Renaming a principal changes the title's response, but not its
+        # `updated_at`
+        self.person.name = "Renamed Actor"
+        self.person.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["principals"][0]["person"]["name"] == (
+            "Renamed Actor"
+        )
+        assert response["ETag"] != etag
+
+    def test_build_lock(self):
+        build = mock.Mock(return_value="built")
+        assert catalog_cache.get_or_build("key", build, 60) == "built"
+        assert catalog_cache.get_or_build("key", build, 60) == "built"
+        assert build.call_count == 1
+
+        # A stale lock of another request delays the build until it expires
+        cache.delete("key")
+        cache.add("lock:key", True)
+        with mock.patch.object(catalog_cache, "BUILD_LOCK_TIMEOUT", 0.1):
+            assert catalog_cache.get_or_build("key", build, 60) == "built"
+        assert build.call_count == 2
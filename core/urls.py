@@ -1,14 +1,20 @@
 from django.urls import path
 
 from .views import (
+    Autocomplete,
+    BulkRating,
     Favorite,
     ListFavorites,
     ListWatchlist,
     PersonDetail,
+    PersonFilmography,
+    PersonMultiGet,
     PersonSearch,
     Recommendations,
     Timeline,
     TitleDetail,
+    TitleMultiGet,
+    TitlePrincipals,
     TitleReviews,
     TitleSearch,
     TopRated,
@@ -19,14 +25,28 @@ from .views import (
 
 urlpatterns = [
     path("title/<int:pk>/", TitleDetail.as_view(), name="title"),
+    path(
+        "title/<int:pk>/principals/",
+        TitlePrincipals.as_view(),
+        name="title-principals",
+    ),
     path("person/<int:pk>/", PersonDetail.as_view(), name="person"),
+    path(
+        "person/<int:pk>/filmography/",
+        PersonFilmography.as_view(),
+        name="person-filmography",
+    ),
+    path("titles/", TitleMultiGet.as_view(), name="titles"),
+    path("people/", PersonMultiGet.as_view(), name="people"),
     path("search/title/", TitleSearch.as_view(), name="search-title"),
     path("search/person/", PersonSearch.as_view(), name="search-person"),
+    path("autocomplete/", Autocomplete.as_view(), name="autocomplete"),
     path("favorite/", Favorite.as_view(), name="favorite"),
     path("watchlist/", Watchlist.as_view(), name="watchlist"),
     path("get-watchlist/", ListWatchlist.as_view(), name="list-watchlist"),
     path("get-favorites/", ListFavorites.as_view(), name="list-favorites"),
     path("rate/", UserRating.as_view(), name="rate-title"),
+    path("rate/bulk/", BulkRating.as_view(), name="bulk-rate-titles"),
     path("review/", UserReview.as_view(), name="review-title"),
     path("reviews/<int:pk>/", TitleReviews.as_view(), name="title-reviews"),
     path("timeline/", Timeline.as_view(), name="timeline"),
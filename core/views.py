@@ -1,66 +1,461 @@
-from django.db.models import Count, F, Q
+import csv
+
+from django.db.models import Prefetch, Q
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import status
-from rest_framework.filters import SearchFilter
-from rest_framework.generics import ListAPIView, RetrieveAPIView
+from rest_framework.exceptions import ParseError
+from rest_framework.generics import (
+    GenericAPIView,
+    ListAPIView,
+    RetrieveAPIView,
+)
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from common.fieldsets import SparseFieldsetsMixin
+from common.pagination import KeysetPagination
 from common.utils import (
     MISSING_REQUIRED_FIELDS,
     get_first_serializer_error,
+    get_integer_list_param,
+    get_integer_param,
+    get_model_fields,
+    get_related_fields,
     response_http,
 )
-
-from .models import ActivityLog, Person, Rating, Review, Title
+from common.values import ValuesListMixin, get_values_serializer
+
+from .autocomplete import PERSON, get_autocomplete_index
+from .cache import (
+    RATING_VERSION,
+    get_cached_detail,
+    get_cached_details,
+    get_detail_validators,
+    get_request_origin,
+)
+from .helpers import (
+    MAX_BULK_RATINGS,
+    clean_ratings,
+    import_ratings,
+    read_ratings_csv,
+)
+from .models import ActivityLog, Person, Principal, Rating, Review, Title
+from .search import (
+    RATING_SORTS,
+    CachedSearchResults,
+    filter_genres,
+    filter_name_prefix,
+    filter_professions,
+    fuzzy_filter,
+    get_search_cache_key,
+    get_title_facets,
+    get_title_ordering,
+    search_titles,
+)
 from .serializers import (
     ActivitySerializer,
     BasicPersonSerializer,
     BasicTitleSerializer,
     CreateReviewSerializer,
+    PersonPrincipalsSerializer,
     PersonSerializer,
     RatingSerializer,
     ReviewSerializer,
+    TitlePrincipalsSerializer,
     TitleSerializer,
 )
 
+# Number of principals included in TitleDetail responses. IMDb lists up to
+# 10 principals per title.
+MAX_DETAIL_PRINCIPALS = 10
+
+# Number of ids accepted by TitleMultiGet and PersonMultiGet
+MAX_MULTI_GET_IDS = 100
+
+
+class CachedDetailMixin:
+    """
+    Mixin for detail views, which serves the serialized data of each object
+    from the cache, see get_cached_detail. `detail_cache_kind` names the
+    version of each object, which is bumped whenever it changes.
+
+    Responses include ETag and Last-Modified headers, and requests with a
+    matching If-None-Match or If-Modified-Since header get an
+    `HTTP 304 Not Modified` response, without reading or serializing the
+    object, see get_detail_validators.
+
+    Views with sparse fieldsets (`serialized_fields`, see
+    SparseFieldsetsMixin) only cache complete responses. Sparse responses
+    are read from a cached complete response if there is one, and are
+    built without caching otherwise.
+    """
+
+    detail_cache_kind = None
+
+    def retrieve(self, request, *args, **kwargs):
+        def build():
+            return self.get_serializer(self.get_object()).data
+
+        kind = self.detail_cache_kind
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        fields = getattr(self, "serialized_fields", None)
+        variant = ",".join(sorted(fields)) if fields is not None else ""
+
+        validators = get_detail_validators(
+            self.get_queryset(), kind, pk, variant
+        )
+        if validators is None:
+            raise Http404
+
+        etag, last_modified = validators
+        last_modified = int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None and fields is None:
+            response = Response(
+                get_cached_detail(kind, pk, get_request_origin(request), build)
+            )
+        elif response is None:
+            cached = get_cached_details(
+                kind, [pk], get_request_origin(request)
+            ).get(pk)
+            if cached is None:
+                response = Response(build())
+            else:
+                response = Response(
+                    {
+                        name: value
+                        for name, value in cached.items()
+                        if name in fields
+                    }
+                )
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
+
+
+class CachedMultiGetMixin:
+    """
+    Mixin for views which return the basic information of several objects,
+    in the order of the comma separated `ids` query param e.g. `?ids=3,1,2`.
+    Objects which do not exist are left out. At most MAX_MULTI_GET_IDS ids
+    are accepted.
+
+    Objects whose detail response is cached are read from it, see
+    get_cached_details, and the other objects with one query.
+    """
+
+    detail_cache_kind = None
+
+    def get(self, request, *args, **kwargs):
+        ids = get_integer_list_param("ids", request.query_params.get("ids"))
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > MAX_MULTI_GET_IDS:
+            raise ParseError(
+                f"Cannot get more than {MAX_MULTI_GET_IDS} objects at once"
+            )
+
+        fields = self.get_serializer_class().Meta.fields
+        cached = get_cached_details(
+            self.detail_cache_kind, ids, get_request_origin(request)
+        )
+        data = {
+            pk: {field: detail[field] for field in fields}
+            for pk, detail in cached.items()
+        }
 
-class TitleDetail(RetrieveAPIView):
+        missing = [pk for pk in ids if pk not in data]
+        if missing:
+            queryset = self.get_queryset().filter(pk__in=missing)
+            for item in self.get_serializer(queryset, many=True).data:
+                data[item["id"]] = item
+
+        return Response([data[pk] for pk in ids if pk in data])
+
+
+class TitleDetail(SparseFieldsetsMixin, CachedDetailMixin, RetrieveAPIView):
     """
     View for retrieving Title instances. Requires the Title id in url
-    params, and appends the average rating and rating count to the instance.
+    params.
+
+    The title, its type and crew are read with one query, and each list of
+    related objects with one more, however many principals or crew members
+    the title has. Only the first MAX_DETAIL_PRINCIPALS principals in
+    billing order, and the first MAX_DETAIL_CREW writers and directors, are
+    included, see TitlePrincipals for the full cast and crew. Only the
+    serialized columns of related people are read. Responses are served
+    from the cache until the title changes.
+
+    Supports sparse fieldsets, see SparseFieldsetsMixin. Relations which
+    are not serialized are not read.
     """
 
-    queryset = (
-        Title.objects.all()
-        .prefetch_related("genres", "type", "crew", "principals")
-        .annotate(rating_count=Count(F("ratings")))
-    )
+    queryset = Title.objects.all()
+    select_related_fields = {"type": ["type"], "crew": ["crew"]}
+    prefetch_related_fields = {
+        "genres": ["genres"],
+        "principals": [
+            Prefetch(
+                "principals",
+                queryset=Principal.objects.filter(
+                    billing_order__lte=MAX_DETAIL_PRINCIPALS
+                )
+                .select_related("person")
+                .only(
+                    "title",
+                    "billing_order",
+                    "category",
+                    "characters",
+                    *get_related_fields("person", BasicPersonSerializer),
+                )
+                .order_by("billing_order", "id"),
+            ),
+        ],
+    }
     serializer_class = TitleSerializer
+    detail_cache_kind = "title"
 
 
-class PersonDetail(RetrieveAPIView):
+class TitlePrincipals(SparseFieldsetsMixin, ListAPIView):
     """
-    View for retrieving Person instances. Requires the Person id in url params.
+    View for retrieving the full cast and crew of a specific Title, in
+    billing order. Requires the Title id in url params. Supports keyset
+    pagination with the `cursor` param, and sparse fieldsets, see
+    SparseFieldsetsMixin.
     """
 
-    queryset = Person.objects.all().prefetch_related(
-        "professions", "known_for_titles", "filmography"
+    queryset = Principal.objects.only(
+        "billing_order",
+        "category",
+        "characters",
+        *get_related_fields("person", BasicPersonSerializer),
     )
+    serializer_class = TitlePrincipalsSerializer
+    pagination_class = KeysetPagination
+    select_related_fields = {"person": ["person"]}
+
+    def get_queryset(self):
+        queryset = (
+            super()
+            .get_queryset()
+            .filter(title=self.kwargs["pk"])
+            .order_by("billing_order", "id")
+        )
+
+        return queryset
+
+
+class TitleMultiGet(CachedMultiGetMixin, GenericAPIView):
+    """
+    View for retrieving the basic information of several Title instances,
+    see CachedMultiGetMixin.
+    """
+
+    queryset = Title.objects.only(*get_model_fields(BasicTitleSerializer))
+    serializer_class = BasicTitleSerializer
+    detail_cache_kind = "title"
+
+
+class PersonMultiGet(CachedMultiGetMixin, GenericAPIView):
+    """
+    View for retrieving the basic information of several Person instances,
+    see CachedMultiGetMixin.
+    """
+
+    queryset = Person.objects.only(*get_model_fields(BasicPersonSerializer))
+    serializer_class = BasicPersonSerializer
+    detail_cache_kind = "person"
+
+
+class PersonDetail(SparseFieldsetsMixin, CachedDetailMixin, RetrieveAPIView):
+    """
+    View for retrieving Person instances. Requires the Person id in url params.
+
+    Each list of related objects is read with one query, however many
+    titles the person has worked on. Only the serialized columns of related
+    titles are read. The filmography is summarized as the number of titles
+    per category, see PersonFilmography for the titles. Responses are
+    served from the cache until the person changes.
+
+    Supports sparse fieldsets, see SparseFieldsetsMixin. Relations which
+    are not serialized are not read.
+    """
+
+    queryset = Person.objects.all()
+    prefetch_related_fields = {
+        "professions": ["professions"],
+        "known_for_titles": [
+            Prefetch(
+                "known_for_titles",
+                queryset=Title.objects.only(
+                    *get_model_fields(BasicTitleSerializer)
+                ),
+            )
+        ],
+    }
     serializer_class = PersonSerializer
+    detail_cache_kind = "person"
+
+
+class PersonFilmography(SparseFieldsetsMixin, ListAPIView):
+    """
+    View for retrieving the filmography of a specific Person, newest titles
+    first. Requires the Person id in url params. Filters by category with
+    the optional `category` param e.g. `actor`. Supports keyset pagination
+    with the `cursor` param, and sparse fieldsets, see SparseFieldsetsMixin.
+
+    Pages are read from the (person, start_year, id) index of Principal, or
+    from the (person, category, start_year, id) index when filtered by
+    category, without joining Title for the ordering.
+    """
+
+    queryset = Principal.objects.only(
+        "start_year",
+        "category",
+        "characters",
+        *get_related_fields("title", BasicTitleSerializer),
+    )
+    serializer_class = PersonPrincipalsSerializer
+    pagination_class = KeysetPagination
+    select_related_fields = {"title": ["title"]}
+
+    def get_queryset(self):
+        queryset = (
+            super()
+            .get_queryset()
+            .filter(person=self.kwargs["pk"])
+            .order_by("-start_year", "-id")
+        )
+
+        category = self.request.query_params.get("category")
+        if category:
+            queryset = queryset.filter(category=category)
+
+        return queryset
+
+
+class CachedSearchMixin(ValuesListMixin):
+    """
+    Mixin for search views, which serves page number pages of
+    `search_model` instances from a cache of ordered result ids, see
+    CachedSearchResults. The cache key is built from the normalized query
+    params, with the names of params holding name queries in
+    `search_name_params`. Keyset pages are always read from the database,
+    since they are index range reads already.
+
+    Results are read and serialized as values, see ValuesListMixin.
+    """
+
+    search_model = None
+    search_cache_prefix = None
+    search_name_params = ()
+
+    def get_search_cache_versions(self):
+        """
+        Returns the names of the versions which the results of the current
+        search depend on, in addition to SEARCH_VERSION.
+        """
+        return []
+
+    def get_search_results(self):
+        values_serializer = self.get_values_serializer()
+
+        def get_queryset():
+            return values_serializer.values(
+                self.filter_queryset(self.get_queryset())
+            )
 
+        if self.paginator.cursor_query_param in self.request.query_params:
+            return get_queryset()
 
-class TitleSearch(ListAPIView):
+        key = get_search_cache_key(
+            self.search_cache_prefix,
+            self.request.query_params,
+            self.search_name_params,
+            self.get_search_cache_versions(),
+        )
+        return CachedSearchResults(
+            self.search_model, get_queryset, key, values_serializer.columns
+        )
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_search_results())
+        return self.get_paginated_response(self.serialize_rows(page))
+
+
+class TitleSearch(SparseFieldsetsMixin, CachedSearchMixin, ListAPIView):
     """
     View for retrieving a paginated list of filtered/sorted Titles. Requires
     the particular filters in query params. If a query is not passed,
     the view will return a paginated list of all Title instances.
 
-    The `sort` param must be a string which can be passed exactly to the
-    queryset e.g. `rating` or `-rating`
+    The `name` param is matched as word prefixes against the title and
+    alternate title (TitleName) search indexes, and results are ranked by
+    relevance unless `sort` is passed. If no name matches, titles with
+    similar names are returned, to allow for typos.
+
+    Titles with any of the `genre` params are returned, or titles with all
+    of them if `genre_match` is `all`.
+
+    The `sort` param must be one of the sort modes `rating`, `votes`,
+    `year`, `runtime`, `name` or `popularity`, and is reversed by a `-`
+    prefix e.g. `-rating`. Every sort mode is backed by an index, see
+    TITLE_SORTS. Other values return an `HTTP 400 Bad Request` response.
+
+    If the `facets` param is `true`, the response also includes title
+    counts per genre, decade and title type for the current filters.
+
+    Supports keyset pagination with the `cursor` param. Page number pages
+    are served from the search results cache. Supports sparse fieldsets,
+    see SparseFieldsetsMixin.
     """
 
     serializer_class = BasicTitleSerializer
+    pagination_class = KeysetPagination
+    search_model = Title
+    search_cache_prefix = "title-search"
+    search_name_params = ("name",)
+
+    def list(self, request, *args, **kwargs):
+        results = self.get_search_results()
+        page = self.paginate_queryset(results)
+        response = self.get_paginated_response(self.serialize_rows(page))
+
+        if request.query_params.get("facets") == "true":
+            key = get_search_cache_key(
+                "title-facets",
+                request.query_params,
+                self.search_name_params,
+                self.get_search_cache_versions(),
+            )
+            response.data["facets"] = get_title_facets(
+                key, lambda: getattr(results, "queryset", results)
+            )
+
+        return response
+
+    def get_search_cache_versions(self):
+        """
+        Returns RATING_VERSION for searches which filter or sort by rating,
+        including the default ordering and name searches.
+        """
+        query_params = self.request.query_params
+        sort = query_params.get("sort", "").removeprefix("-")
+
+        if (
+            sort in ("", *RATING_SORTS)
+            or query_params.get("min_rating")
+            or query_params.get("max_rating")
+        ):
+            return [RATING_VERSION]
+
+        return []
 
     def get_queryset(self):
         """
@@ -77,42 +472,135 @@ class TitleSearch(ListAPIView):
 
         queryset = Title.objects.all()
 
-        if sort:
-            queryset = queryset.order_by(sort, "start_year")
-        else:
-            queryset = queryset.order_by("-rating", "start_year")
-
         if name:
-            queryset = queryset.filter(name__icontains=name)
+            queryset = search_titles(queryset, name)
         if genres:
-            queryset = queryset.filter(genres__name__in=genres)
+            queryset = filter_genres(
+                queryset, genres, query_params.get("genre_match") == "all"
+            )
         if min_rating:
             queryset = queryset.filter(rating__gte=min_rating)
         if max_rating:
             queryset = queryset.filter(rating__lte=max_rating)
         if min_year:
-            queryset = queryset.filter(start_year__gte=min_year)
+            queryset = queryset.filter(
+                start_year__gte=get_integer_param("min_year", min_year)
+            )
         if max_year:
-            queryset = queryset.filter(start_year__lte=max_year)
+            queryset = queryset.filter(
+                start_year__lte=get_integer_param("max_year", max_year)
+            )
+
+        if sort:
+            queryset = queryset.order_by(*get_title_ordering(sort))
+        elif name:
+            queryset = queryset.order_by("-relevance", "-rating", "id")
+        else:
+            queryset = queryset.order_by("-rating", "start_year", "id")
 
         return queryset
 
 
-class PersonSearch(ListAPIView):
+class PersonSearch(SparseFieldsetsMixin, CachedSearchMixin, ListAPIView):
     """
     View for retrieving a paginated list of filtered Person objects. The
     search query must be passed in the query params with the `search` key.
     If a query is not passed, the view will return a paginated list of all
     Person instances.
 
-    The resultant queryset is always sorted by `name`.
-    """
+    People with a word of their normalized name starting with each word of
+    the normalized query are returned, sorted by name. If the search query matches no names, people
+    with similar names are returned instead, sorted by similarity.
+
+    People with any of the `profession` params are returned, or people with
+    all of them if `profession_match` is `all`. `min_birth_year` and
+    `max_birth_year` filter by birth year. Name prefix and birth year
+    filters are index range reads, and professions are matched against the
+    profession bitmask of each person read from the index.
 
-    queryset = Person.objects.all().order_by("name", "id")
+    Supports keyset pagination with the `cursor` param. Page number pages
+    are served from the search results cache. Supports sparse fieldsets,
+    see SparseFieldsetsMixin.
+    """
 
     serializer_class = BasicPersonSerializer
-    filter_backends = [SearchFilter]
-    search_fields = ["name"]
+    pagination_class = KeysetPagination
+    search_model = Person
+    search_cache_prefix = "person-search"
+    search_name_params = ("search",)
+
+    def get_queryset(self):
+        """
+        Function to build a queryset according to the query params, except
+        for the name search.
+        """
+        query_params = self.request.query_params
+        professions = query_params.getlist("profession")
+        min_birth_year = query_params.get("min_birth_year")
+        max_birth_year = query_params.get("max_birth_year")
+
+        queryset = Person.objects.all()
+
+        if professions:
+            queryset = filter_professions(
+                queryset,
+                professions,
+                query_params.get("profession_match") == "all",
+            )
+        if min_birth_year:
+            queryset = queryset.filter(
+                birth_year__gte=get_integer_param(
+                    "min_birth_year", min_birth_year
+                )
+            )
+        if max_birth_year:
+            queryset = queryset.filter(
+                birth_year__lte=get_integer_param(
+                    "max_birth_year", max_birth_year
+                )
+            )
+
+        return queryset.order_by("normalized_name", "id")
+
+    def filter_queryset(self, queryset):
+        search = self.request.query_params.get("search")
+        if not search:
+            return queryset
+
+        filtered = filter_name_prefix(queryset, search)
+        if not filtered.exists():
+            return fuzzy_filter(queryset, PERSON, search).order_by(
+                "-relevance", "id"
+            )
+
+        return filtered
+
+
+class Autocomplete(APIView):
+    """
+    View for retrieving Title and Person suggestions while the user types.
+    Requires the typed text in the `q` query param, and optionally the
+    maximum number of suggestions in `limit`.
+
+    Suggestions are served from the autocomplete index, without querying
+    the database. If the index has not been built, the list is empty.
+    """
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+
+        try:
+            limit = int(request.query_params.get("limit", 10))
+        except ValueError:
+            return response_http(
+                "Limit must be an integer", status.HTTP_400_BAD_REQUEST
+            )
+
+        index = get_autocomplete_index()
+        if index is None:
+            return Response([])
+
+        return Response(index.suggest(query, max(limit, 1)))
 
 
 class Watchlist(APIView):
@@ -256,9 +744,10 @@ class Favorite(APIView):
             )
 
 
-class ListWatchlist(ListAPIView):
+class ListWatchlist(ValuesListMixin, ListAPIView):
     """
-    View for retrieving the user's watchlist.
+    View for retrieving the user's watchlist. Titles are read and
+    serialized as values, see ValuesListMixin.
     """
 
     permission_classes = [IsAuthenticated]
@@ -269,9 +758,10 @@ class ListWatchlist(ListAPIView):
         return queryset
 
 
-class ListFavorites(ListAPIView):
+class ListFavorites(ValuesListMixin, ListAPIView):
     """
-    View for retrieving the user's favorites.
+    View for retrieving the user's favorites. Titles are read and
+    serialized as values, see ValuesListMixin.
     """
 
     permission_classes = [IsAuthenticated]
@@ -340,6 +830,57 @@ class UserRating(APIView):
         return response_http(message, status.HTTP_200_OK)
 
 
+class BulkRating(APIView):
+    """
+    View for importing many ratings at once, e.g. a rating history exported
+    from another site. Requires either a `ratings` list of objects with `id`
+    and `rating` keys, or a CSV `file` with `id` and `rating` columns in a
+    `multipart/form-data` http request.
+    """
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def post(self, request):
+        """
+        Method for importing ratings. Rows with an invalid rating, or a title
+        which does not exist, are skipped. Returns the number of imported
+        and skipped rows.
+        """
+
+        try:
+            if "file" in request.FILES:
+                rows = read_ratings_csv(request.FILES["file"])
+            else:
+                rows = request.data["ratings"]
+        except (KeyError, UnicodeDecodeError, ValueError, csv.Error):
+            return response_http(
+                MISSING_REQUIRED_FIELDS, status.HTTP_400_BAD_REQUEST
+            )
+
+        if not isinstance(rows, list) or not rows:
+            return response_http(
+                MISSING_REQUIRED_FIELDS, status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(rows) > MAX_BULK_RATINGS:
+            return response_http(
+                f"Cannot import more than {MAX_BULK_RATINGS} ratings at once",
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+        ratings, _ = clean_ratings(rows)
+        imported = import_ratings(request.user, ratings)
+
+        return Response(
+            {
+                "message": f"Imported {len(imported)} ratings",
+                "imported": len(imported),
+                "skipped": len(rows) - len(imported),
+            }
+        )
+
+
 class UserReview(APIView):
     """
     View for retrieving, creating or updating a Review instance.
@@ -401,10 +942,12 @@ class UserReview(APIView):
 
 class TitleReviews(ListAPIView):
     """
-    View for retrieving Reviews belonging to a specific Title.
+    View for retrieving Reviews belonging to a specific Title. Supports
+    keyset pagination with the `cursor` param.
     """
 
     serializer_class = ReviewSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         title_id = self.kwargs["pk"]
@@ -419,11 +962,13 @@ class TitleReviews(ListAPIView):
 
 class Timeline(ListAPIView):
     """
-    View for retrieving the activity log for user timeline.
+    View for retrieving the activity log for user timeline. Supports keyset
+    pagination with the `cursor` param.
     """
 
     permission_classes = [IsAuthenticated]
     serializer_class = ActivitySerializer
+    pagination_class = KeysetPagination
 
     def get_serializer_context(self):
         context = super(Timeline, self).get_serializer_context()
@@ -437,7 +982,7 @@ class Timeline(ListAPIView):
 
         queryset = (
             ActivityLog.objects.filter(user__id__in=following_list)
-            .order_by("-created_at")
+            .order_by("-created_at", "-id")
             .prefetch_related("rating", "review", "title", "user")
         )
 
@@ -459,10 +1004,11 @@ class Recommendations(APIView):
             | Q(favorites_set__id__in=user.follows.all())
         ).order_by("?")[:5]
 
-        serializer = BasicTitleSerializer(
-            recommendations, many=True, context={"request": request}
+        values_serializer = get_values_serializer(BasicTitleSerializer)
+        rows = values_serializer.values(recommendations)
+        return Response(
+            values_serializer.serialize(rows, {"request": request})
         )
-        return Response(serializer.data)
 
 
 class TopRated(APIView):
@@ -475,7 +1021,8 @@ class TopRated(APIView):
             "-rating"
         )[:10]
 
-        serializer = BasicTitleSerializer(
-            recommendations, many=True, context={"request": request}
+        values_serializer = get_values_serializer(BasicTitleSerializer)
+        rows = values_serializer.values(recommendations)
+        return Response(
+            values_serializer.serialize(rows, {"request": request})
         )
-        return Response(serializer.data)
@@ -10,7 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
-import os.path
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -116,6 +116,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# Cached responses are invalidated by versions, and built under locks (see
+# core/cache.py), which every process must share. The local memory cache
+# is private to each process, so it only suits a single process e.g. the
+# development server. Set MEMCACHED_LOCATION e.g. to `127.0.0.1:11211` to
+# share a Memcached server, which requires pymemcache.
+MEMCACHED_LOCATION = os.environ.get("MEMCACHED_LOCATION")
+
+if MEMCACHED_LOCATION:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached"
+            ".PyMemcacheCache",
+            "LOCATION": MEMCACHED_LOCATION.split(","),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+FACETS_CACHE_TIMEOUT = 300
+SEARCH_RESULTS_CACHE_TIMEOUT = 300
+DETAIL_CACHE_TIMEOUT = 3600
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
@@ -158,6 +187,27 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, "static")]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Renditions of uploaded images, stored next to the originals. Each
+# rendition fits in a box of (width, height) pixels.
+IMAGE_RENDITIONS = {
+    "thumbnail": (92, 138),
+    "medium": (300, 450),
+}
+IMAGE_RENDITION_QUALITY = 85
+
+# Uploaded avatars are scaled down to fit in a box of (width, height)
+# pixels by AVATAR_PROCESSING_WORKERS background threads per process.
+# Uploads still pending after AVATAR_PENDING_TIMEOUT seconds are processed
+# by the `process_pending_avatars` command.
+AVATAR_MAX_SIZE = (512, 512)
+AVATAR_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+AVATAR_PROCESSING_WORKERS = 2
+AVATAR_PENDING_TIMEOUT = 600
+
+# Search indexes built from the database, shared by every worker
+INDEXES_ROOT = os.path.join(BASE_DIR, "indexes")
+AUTOCOMPLETE_INDEX_PATH = os.path.join(INDEXES_ROOT, "autocomplete.idx")
+
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = "localhost"
 EMAIL_PORT = 1025
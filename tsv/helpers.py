@@ -4,6 +4,7 @@ from distutils.util import strtobool
 
 from django.db.utils import IntegrityError
 
+from core.cache import catalog_update
 from core.models import (
     Crew,
     Genre,
@@ -22,7 +23,11 @@ logger = logging.getLogger(__name__)
 def open_file_and_call_parser(file):
     """
     Opens the file and reads the file name to invoke the corresponding
-    parsing function. Logs file name if there is no corresponding function
+    parsing function. Logs file name if there is no corresponding function.
+    Cached search results and detail responses are invalidated once the
+    file is parsed, instead of once per row. The autocomplete index is not
+    rebuilt here, since a build reads every title and person; run the
+    `build_autocomplete` command once the files are ingested.
 
     Args:
         file: Object containing FileField of the uploaded tsv file
@@ -31,7 +36,7 @@ def open_file_and_call_parser(file):
         None
     """
 
-    with open(file.path, "r") as tsv_file:
+    with open(file.path, "r") as tsv_file, catalog_update():
         file_name = file.name
         reader = csv.reader(tsv_file, delimiter="\t")
         next(reader)
@@ -91,6 +96,24 @@ def normalize_person(person_id):
     return int(person_id)
 
 
+def normalize_year(year):
+    """
+    Converts a year string into an integer
+
+    Args:
+        year (): string variable containing a year, or None
+
+    Returns:
+        year: integer variable containing the year, or None if the year is
+        missing or invalid
+    """
+
+    try:
+        return int(year)
+    except (TypeError, ValueError):
+        return None
+
+
 def read_field_data(model_fields, row):
     """
     Matches data from .tsv row to its corresponding model field
@@ -140,11 +163,12 @@ def parse_basics(tsv_rows):
         "genres",
     ]
 
-    genres = None
-
     for row in tsv_rows:
+        genres = None
         instance = read_field_data(model_fields, row)
         instance["id"] = normalize_title(instance["id"])
+        instance["start_year"] = normalize_year(instance["start_year"])
+        instance["end_year"] = normalize_year(instance["end_year"])
 
         if Title.objects.filter(id=instance["id"]).exists():
             logger.info("Duplicate Title")
@@ -158,10 +182,12 @@ def parse_basics(tsv_rows):
                 name=instance["type"]
             )
 
+        instance["genre_mask"] = 0
         if instance["genres"]:
             genres = instance["genres"].split(",")
             for index, genre in enumerate(genres):
                 genres[index], _ = Genre.objects.get_or_create(name=genre)
+                instance["genre_mask"] |= genres[index].flag
                 genres[index] = genres[index].id
 
         instance.pop("genres", None)
@@ -171,7 +197,6 @@ def parse_basics(tsv_rows):
 
             if genres is not None:
                 new_title.genres.add(*genres)
-                new_title.save()
 
             logger.info("Created Title %s", instance["id"])
         except (ValueError, TypeError, IntegrityError) as error:
@@ -278,17 +303,19 @@ def parse_name_basics(tsv_rows):
         "known_for_titles",
     ]
 
-    professions = titles = None
-
     for row in tsv_rows:
+        professions = titles = None
         instance = read_field_data(model_fields, row)
         instance["id"] = normalize_person(instance["id"])
+        instance["birth_year"] = normalize_year(instance["birth_year"])
+        instance["death_year"] = normalize_year(instance["death_year"])
 
         if Person.objects.filter(id=instance["id"]).exists():
             logger.info("Duplicate Person")
             continue
 
         # 5th column of a row contains the list of professions
+        instance["profession_mask"] = 0
         if instance["professions"]:
             professions = instance["professions"].split(",")
 
@@ -296,6 +323,7 @@ def parse_name_basics(tsv_rows):
                 professions[index], _ = Profession.objects.get_or_create(
                     name=profession
                 )
+                instance["profession_mask"] |= professions[index].flag
                 professions[index] = professions[index].id
 
         # 6th column of a row contains the list of titles
@@ -339,18 +367,31 @@ def parse_principal(tsv_rows):
         None
     """
 
-    model_fields = ["title", "skip", "person", "category", "job", "characters"]
+    model_fields = [
+        "title",
+        "billing_order",
+        "person",
+        "category",
+        "job",
+        "characters",
+    ]
 
     for row in tsv_rows:
         instance = read_field_data(model_fields, row)
         instance["title"] = normalize_title(instance["title"])
         instance["person"] = normalize_person(instance["person"])
 
-        if Principal.objects.filter(
+        duplicates = Principal.objects.filter(
             title=instance["title"],
             person=instance["person"],
             category=instance["category"],
-        ).exists():
+        )
+        if duplicates.exists():
+            # Principals ingested before the billing order was stored get
+            # it from the next ingestion of the file
+            duplicates.exclude(billing_order=instance["billing_order"]).update(
+                billing_order=instance["billing_order"]
+            )
             logger.info("Duplicate Principal")
             continue
 
@@ -0,0 +1,166 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from common.images import create_renditions, delete_renditions
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.AVATAR_PROCESSING_WORKERS,
+    thread_name_prefix="avatar",
+)
+
+
+def fail_avatar(user_id, pending_name):
+    """
+    Marks an upload as failed, if it is still the user's latest one, and
+    deletes it.
+    """
+
+    storage = User._meta.get_field("image").storage
+    User.objects.filter(pk=user_id, pending_image=pending_name).update(
+        pending_image="", image_status=User.ImageStatus.FAILED
+    )
+    storage.delete(pending_name)
+
+
+def process_avatar(user_id, pending_name):
+    """
+    Processes an uploaded avatar: decodes it, rotates it according to its
+    EXIF orientation, scales it down to fit AVATAR_MAX_SIZE and saves it as
+    a JPEG with its renditions. The user's image is then replaced with a
+    single conditional update, only if the upload is still the user's
+    latest one. The raw upload is deleted either way.
+
+    Args:
+        user_id: id of the User
+        pending_name: storage name of the raw upload
+
+    Returns:
+        processed: True if the user's image was replaced
+    """
+
+    image_field = User._meta.get_field("image")
+    storage = image_field.storage
+    pending = User.objects.filter(pk=user_id, pending_image=pending_name)
+
+    try:
+        with storage.open(pending_name) as file:
+            image = Image.open(file)
+            # Lets the JPEG decoder scale down while decoding
+            image.draft("RGB", settings.AVATAR_MAX_SIZE)
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except (OSError, Image.DecompressionBombError) as error:
+        logger.warning("Could not read avatar %s: %s", pending_name, error)
+        fail_avatar(user_id, pending_name)
+        return False
+
+    image.thumbnail(settings.AVATAR_MAX_SIZE, Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(
+        buffer, "JPEG", quality=settings.IMAGE_RENDITION_QUALITY, optimize=True
+    )
+
+    root, _ = os.path.splitext(os.path.basename(pending_name))
+    name = storage.save(
+        image_field.generate_filename(None, f"{root}.jpg"),
+        ContentFile(buffer.getvalue()),
+    )
+    create_renditions(name, storage)
+
+    processed = pending.update(
+        image=name, pending_image="", image_status=User.ImageStatus.READY
+    )
+    if not processed:
+        # A newer upload replaced this one while it was processed
+        delete_renditions(name, storage)
+        storage.delete(name)
+
+    storage.delete(pending_name)
+    return bool(processed)
+
+
+def process_or_fail_avatar(user_id, pending_name):
+    """
+    Processes an uploaded avatar, see process_avatar, and marks the upload
+    as failed if processing raises.
+    """
+
+    try:
+        return process_avatar(user_id, pending_name)
+    except Exception:
+        logger.exception("Error while processing avatar %s", pending_name)
+        fail_avatar(user_id, pending_name)
+        return False
+
+
+def run_process_avatar(user_id, pending_name):
+    try:
+        process_or_fail_avatar(user_id, pending_name)
+    finally:
+        # Worker threads keep their own database connections
+        connection.close()
+
+
+def schedule_avatar_processing(user_id, pending_name):
+    """
+    Processes an uploaded avatar in a background thread, see
+    process_avatar, once the current transaction is committed.
+
+    Background processing is best effort: uploads which are still queued
+    when the process exits stay pending. They are processed by
+    process_stale_avatars, see the `process_pending_avatars` command.
+    """
+
+    transaction.on_commit(
+        lambda: executor.submit(run_process_avatar, user_id, pending_name)
+    )
+
+
+def process_stale_avatars(max_age):
+    """
+    Processes the uploads which are still pending `max_age` seconds after
+    they were stored, e.g. because the process which scheduled them exited
+    first. Uploads are processed one by one in the current thread. An
+    upload which is also processed by a background thread is only applied
+    once, see process_avatar.
+
+    Args:
+        max_age: number of seconds after which a pending upload is stale
+
+    Returns:
+        count: number of stale uploads which were processed
+    """
+
+    storage = User._meta.get_field("pending_image").storage
+    stale_before = timezone.now() - timedelta(seconds=max_age)
+    pending = (
+        User.objects.filter(image_status=User.ImageStatus.PENDING)
+        .exclude(pending_image="")
+        .values_list("pk", "pending_image")
+    )
+
+    count = 0
+    for user_id, pending_name in pending:
+        try:
+            stored_at = storage.get_modified_time(pending_name)
+        except OSError:
+            # A missing upload fails when it is processed
+            stored_at = None
+
+        if stored_at is None or stored_at < stale_before:
+            process_or_fail_avatar(user_id, pending_name)
+            count += 1
+
+    return count
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.avatars import process_stale_avatars
+
+
+class Command(BaseCommand):
+    help = "Process avatar uploads which are stuck in the pending status"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age",
+            type=int,
+            default=settings.AVATAR_PENDING_TIMEOUT,
+            help="Seconds after which a pending upload is processed",
+        )
+
+    def handle(self, *args, **options):
+        count = process_stale_avatars(options["max_age"])
+        self.stdout.write(f"Processed {count} pending avatars")
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_auto_20210929_1134"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["first_name", "id"], name="users_first_n_fe1cac_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.6 on 2026-10-19 00:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from common.utils import MAX_STRING_LENGTH, normalize_name
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_name_tokens(apps, schema_editor):
+    User = apps.get_model("users", "User")
+    UserNameToken = apps.get_model("users", "UserNameToken")
+    tokens = []
+
+    users = User.objects.values_list("id", "first_name", "last_name")
+    for user_id, first_name, last_name in users.iterator():
+        name = normalize_name(f"{first_name} {last_name}")
+        for token in {token[:MAX_STRING_LENGTH] for token in name.split()}:
+            tokens.append(UserNameToken(user_id=user_id, token=token))
+
+        if len(tokens) >= BACKFILL_BATCH_SIZE:
+            UserNameToken.objects.bulk_create(tokens)
+            tokens = []
+
+    UserNameToken.objects.bulk_create(tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0006_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserNameToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(max_length=255)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="name_tokens",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(backfill_name_tokens, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="usernametoken",
+            index=models.Index(
+                fields=["token", "user"], name="users_usern_token_6744fa_idx"
+            ),
+        ),
+    ]
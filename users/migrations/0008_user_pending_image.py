@@ -0,0 +1,34 @@
+# Generated by Django 3.2.6 on 2026-10-19 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0007_user_name_tokens"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="image_status",
+            field=models.CharField(
+                choices=[
+                    ("ready", "Ready"),
+                    ("pending", "Pending"),
+                    ("failed", "Failed"),
+                ],
+                default="ready",
+                editable=False,
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="pending_image",
+            field=models.ImageField(
+                blank=True, editable=False, upload_to="user/pending"
+            ),
+        ),
+    ]
@@ -3,7 +3,7 @@ from django.core.validators import MinValueValidator
 from django.db import models
 from django_countries.fields import CountryField
 
-from common.utils import MAX_STRING_LENGTH
+from common.utils import MAX_STRING_LENGTH, normalize_name
 from core.models import Title
 
 
@@ -42,8 +42,17 @@ class User(AbstractUser):
     """
     Custom user model. Removes username, first_name, and last_name fields
     inherited form AbstractUser class.
+
+    An uploaded avatar is stored in `pending_image` while it is processed in
+    the background, and replaces `image` when it is ready, see
+    users.avatars. `image_status` is the state of the latest upload.
     """
 
+    class ImageStatus(models.TextChoices):
+        READY = "ready"
+        PENDING = "pending"
+        FAILED = "failed"
+
     username = None
     first_name = models.CharField(max_length=MAX_STRING_LENGTH)
     last_name = models.CharField(max_length=MAX_STRING_LENGTH)
@@ -61,6 +70,15 @@ class User(AbstractUser):
         Title, blank=True, related_name="favorites_set"
     )
     image = models.ImageField(upload_to="user", blank=True)
+    pending_image = models.ImageField(
+        upload_to="user/pending", blank=True, editable=False
+    )
+    image_status = models.CharField(
+        max_length=10,
+        choices=ImageStatus.choices,
+        default=ImageStatus.READY,
+        editable=False,
+    )
     timezone = models.CharField(max_length=MAX_STRING_LENGTH, blank=True)
     login_alert_preference = models.BooleanField(default=True)
     email_list_preference = models.BooleanField(default=True)
@@ -72,6 +90,33 @@ class User(AbstractUser):
 
     class Meta:
         db_table = "users"
+        indexes = [models.Index(fields=["first_name", "id"])]
 
     def __str__(self):
         return self.email
+
+    def get_name_tokens(self):
+        """
+        Returns the set of normalized words of the user's first and last
+        name, see normalize_name.
+        """
+
+        name = normalize_name(f"{self.first_name} {self.last_name}")
+        return {token[:MAX_STRING_LENGTH] for token in name.split()}
+
+
+class UserNameToken(models.Model):
+    """
+    UserNameToken model, for every normalized word of a User's first and
+    last name. Users are searched by name through the `token` index, instead
+    of scanning the users table. Maintained by the `update_name_tokens`
+    signal.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="name_tokens"
+    )
+    token = models.CharField(max_length=MAX_STRING_LENGTH)
+
+    class Meta:
+        indexes = [models.Index(fields=["token", "user"])]
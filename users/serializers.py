@@ -7,6 +7,8 @@ from django_countries.serializers import CountryFieldMixin
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from common.images import ImageRenditionsField
+
 from .emails import (
     send_login_email,
     send_password_changed_email,
@@ -27,6 +29,7 @@ class UserSerializer(serializers.ModelSerializer):
     """
 
     country = CountryField(country_dict=True)
+    image_renditions = ImageRenditionsField(source="image")
 
     class Meta:
         model = User
@@ -39,6 +42,8 @@ class UserSerializer(serializers.ModelSerializer):
             "age",
             "date_joined",
             "image",
+            "image_renditions",
+            "image_status",
         ]
 
 
@@ -48,6 +53,7 @@ class PrivateUserSerializer(serializers.ModelSerializer):
     """
 
     country = CountryField(country_dict=True)
+    image_renditions = ImageRenditionsField(source="image")
 
     class Meta:
         model = User
@@ -62,6 +68,8 @@ class PrivateUserSerializer(serializers.ModelSerializer):
             "follows",
             "followers",
             "image",
+            "image_renditions",
+            "image_status",
             "timezone",
             "email_list_preference",
             "login_alert_preference",
@@ -248,9 +256,18 @@ class FollowSerializer(serializers.ModelSerializer):
     every User object in the list
     """
 
+    image_renditions = ImageRenditionsField(source="image")
+
     class Meta:
         model = User
-        fields = ["id", "email", "first_name", "last_name", "image"]
+        fields = [
+            "id",
+            "email",
+            "first_name",
+            "last_name",
+            "image",
+            "image_renditions",
+        ]
 
 
 class ChangePasswordSerializer(serializers.ModelSerializer):
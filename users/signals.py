@@ -0,0 +1,29 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from common.images import create_image_renditions
+
+from .models import User, UserNameToken
+
+
+@receiver(post_save, sender=User)
+def update_name_tokens(sender, instance, created, update_fields, **kwargs):
+
+    if update_fields is not None and not {"first_name", "last_name"} & set(
+        update_fields
+    ):
+        return
+
+    tokens = instance.get_name_tokens()
+    if not created:
+        existing = set(instance.name_tokens.values_list("token", flat=True))
+        if existing == tokens:
+            return
+        instance.name_tokens.all().delete()
+
+    UserNameToken.objects.bulk_create(
+        [UserNameToken(user=instance, token=token) for token in tokens]
+    )
+
+
+post_save.connect(create_image_renditions, sender=User)
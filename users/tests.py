@@ -1,14 +1,26 @@
 import copy
+import io
 import json
 import logging
+import os
+import tempfile
+import time
+from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse
 from parameterized import parameterized
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from . import avatars
+
 logging.disable(logging.CRITICAL)
 User = get_user_model()
 client_user_data = {
@@ -200,3 +212,176 @@ class Profile(APITestCase):
         assert response.status_code == status.HTTP_200_OK
         assert profile.get("id") is not None
         assert profile.get("email_list_preference") is None
+
+
+class UserSearchTest(APITestCase):
+    """
+    Tests searching users by name prefix and exact email.
+    """
+
+    url = reverse("search-user")
+
+    def setUp(self):
+        users = [
+            ("Zoë", "Adams", "zoe@test.com"),
+            ("Adam", "Zoellner", "adam@test.com"),
+            ("Eve", "Smith", "eve@test.com"),
+        ]
+        for first_name, last_name, email in users:
+            User.objects.create_user(
+                first_name=first_name,
+                last_name=last_name,
+                email=email,
+                password="1234",
+                age=18,
+                country="PK",
+                is_active=True,
+            )
+
+    def search(self, query):
+        response = self.client.get(self.url, {"search": query})
+        assert response.status_code == status.HTTP_200_OK
+        return [user["email"] for user in response.data["results"]]
+
+    def test_name_prefix_search(self):
+        assert self.search("zoe") == ["adam@test.com", "zoe@test.com"]
+        assert self.search("ADA zo") == ["adam@test.com", "zoe@test.com"]
+        assert self.search("smi") == ["eve@test.com"]
+
+    def test_exact_email_search(self):
+        assert self.search("Eve@Test.com") == ["eve@test.com"]
+        assert self.search("eve@test") == []
+
+    def test_name_tokens_updated(self):
+        user = User.objects.get(email="eve@test.com")
+        user.last_name = "Jones"
+        user.save()
+
+        assert self.search("smi") == []
+        assert self.search("jon") == ["eve@test.com"]
+
+
+class AvatarUploadTest(APITestCase):
+    """
+    Tests storing avatar uploads, and processing them in the background.
+    """
+
+    url = reverse("upload-avatar")
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.media_root = directory.name
+
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(**client_user_data)
+        self.client.force_authenticate(self.user)
+
+    def get_jpeg(self, size, orientation=None):
+        buffer = io.BytesIO()
+        exif = Image.Exif()
+        if orientation is not None:
+            exif[0x0112] = orientation
+        Image.new("RGB", size, (10, 120, 200)).save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile("photo.jpg", buffer.getvalue(), "image/jpeg")
+
+    def upload(self, file):
+        with mock.patch("users.views.schedule_avatar_processing") as schedule:
+            response = self.client.post(
+                self.url, {"image": file}, format="multipart"
+            )
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data["image_status"] == "pending"
+        return schedule.call_args[0]
+
+    def test_upload(self):
+        user_id, pending_name = self.upload(self.get_jpeg((800, 400), 6))
+
+        self.user.refresh_from_db()
+        assert user_id == self.user.pk
+        assert self.user.pending_image.name == pending_name
+        assert self.user.image_status == User.ImageStatus.PENDING
+        assert not self.user.image
+
+        assert avatars.process_avatar(user_id, pending_name)
+
+        self.user.refresh_from_db()
+        assert self.user.image_status == User.ImageStatus.READY
+        assert not self.user.pending_image
+        assert not os.path.exists(os.path.join(self.media_root, pending_name))
+
+        # Rotated by the EXIF orientation, and scaled down
+        with Image.open(self.user.image.path) as image:
+            assert image.size == (256, 512)
+
+    def test_newer_upload(self):
+        first = self.upload(self.get_jpeg((100, 100)))
+        second = self.upload(self.get_jpeg((100, 100)))
+
+        assert not avatars.process_avatar(*first)
+        self.user.refresh_from_db()
+        assert self.user.image_status == User.ImageStatus.PENDING
+        assert self.user.pending_image.name == second[1]
+
+        assert avatars.process_avatar(*second)
+
+    def test_invalid_image(self):
+        upload = SimpleUploadedFile("photo.jpg", b"not an image")
+        assert not avatars.process_avatar(*self.upload(upload))
+
+        self.user.refresh_from_db()
+        assert self.user.image_status == User.ImageStatus.FAILED
+        assert not self.user.image
+
+    def test_failed_processing(self):
+        user_id, pending_name = self.upload(self.get_jpeg((100, 100)))
+
+        # The worker's connection is not closed, since the test case holds
+        # it in a transaction
+        with mock.patch(
+            "django.core.files.storage.FileSystemStorage.save",
+            side_effect=OSError("No space left on device"),
+        ), mock.patch("users.avatars.connection"):
+            avatars.run_process_avatar(user_id, pending_name)
+
+        self.user.refresh_from_db()
+        assert self.user.image_status == User.ImageStatus.FAILED
+        assert not self.user.pending_image
+        assert not os.path.exists(os.path.join(self.media_root, pending_name))
+
+    def test_stale_pending_uploads(self):
+        user_id, pending_name = self.upload(self.get_jpeg((100, 100)))
+        output = io.StringIO()
+
+        call_command("process_pending_avatars", stdout=output)
+        self.user.refresh_from_db()
+        assert self.user.image_status == User.ImageStatus.PENDING
+
+        # The upload was never processed, e.g. after a restart
+        stored_at = time.time() - settings.AVATAR_PENDING_TIMEOUT - 1
+        path = os.path.join(self.media_root, pending_name)
+        os.utime(path, (stored_at, stored_at))
+
+        call_command("process_pending_avatars", stdout=output)
+        self.user.refresh_from_db()
+        assert self.user.image_status == User.ImageStatus.READY
+        assert not os.path.exists(path)
+
+    def test_missing_image(self):
+        response = self.client.post(self.url, {}, format="multipart")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_scheduled_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(
+                self.url,
+                {"image": self.get_jpeg((10, 10))},
+                format="multipart",
+            )
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert len(callbacks) == 1
@@ -3,7 +3,9 @@ from django.utils.encoding import force_text
 from django.utils.http import urlsafe_base64_decode
 from rest_framework import serializers
 
-from .models import User
+from common.utils import normalize_name
+
+from .models import User, UserNameToken
 
 
 class BaseUserTokenSerializer(serializers.Serializer):
@@ -52,3 +54,35 @@ class VerificationTokenGenerator(PasswordResetTokenGenerator):
 
 verification_token = VerificationTokenGenerator()
 password_reset_token = PasswordResetTokenGenerator()
+
+
+def search_users(queryset, query):
+    """
+    Filters a User queryset by a search query. A query containing `@` is
+    matched exactly against the email, using its unique index. Otherwise,
+    every normalized word of the query must be a prefix of a word of the
+    user's name, and each word is an index range read of UserNameToken.
+
+    Args:
+        queryset: User queryset to filter
+        query: string containing the search query
+
+    Returns:
+        queryset: filtered User queryset
+    """
+
+    query = query.strip()
+    if "@" in query:
+        return queryset.filter(email__iexact=query)
+
+    terms = normalize_name(query).split()
+    if not terms:
+        return queryset.none()
+
+    for term in terms:
+        user_ids = UserNameToken.objects.filter(
+            token__istartswith=term
+        ).values("user")
+        queryset = queryset.filter(id__in=user_ids)
+
+    return queryset
@@ -1,8 +1,9 @@
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 from django.shortcuts import get_object_or_404
 from django.utils.decorators import method_decorator
 from django.views.decorators.debug import sensitive_post_parameters
 from rest_framework import status, viewsets
-from rest_framework.filters import SearchFilter
 from rest_framework.generics import ListAPIView
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
@@ -10,6 +11,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from common.pagination import KeysetPagination
 from common.utils import (
     MISSING_REQUIRED_FIELDS,
     get_first_serializer_error,
@@ -18,6 +20,7 @@ from common.utils import (
 from core.models import ActivityLog
 from core.serializers import ActivitySerializer
 
+from .avatars import schedule_avatar_processing
 from .emails import (
     send_password_changed_email,
     send_password_reset_link,
@@ -35,6 +38,7 @@ from .serializers import (
     UserSerializer,
     VerificationSerializer,
 )
+from .utils import search_users
 
 
 class Login(APIView):
@@ -338,23 +342,45 @@ class UserFollowing(ListAPIView):
 
 class AvatarUpload(APIView):
     """
-    View for uploading User Avatar. Requires a single image file in a
-    `multipart/form-data` http request.
+    View for uploading User Avatar. Requires a single image file in the
+    `image` field of a `multipart/form-data` http request.
+
+    The upload is stored as is, and processed in the background, see
+    users.avatars. Returns an `HTTP 202 Accepted` response with the
+    `pending` image status right away. The user's `image_status` becomes
+    `ready` when the new avatar replaces the old one, or `failed` if the
+    upload is not a readable image.
     """
 
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request):
-        serializer = UserSerializer(
-            request.user, data=request.data, partial=True
-        )
-        if serializer.is_valid():
-            serializer.save()
-            return response_http("Uploaded", status.HTTP_200_OK)
+        upload = request.data.get("image")
+        if not isinstance(upload, UploadedFile):
+            return response_http(
+                "No image was uploaded", status.HTTP_400_BAD_REQUEST
+            )
+        if upload.size > settings.AVATAR_MAX_UPLOAD_SIZE:
+            return response_http(
+                "The image is too large", status.HTTP_400_BAD_REQUEST
+            )
 
-        message = get_first_serializer_error(serializer.errors)
-        return response_http(message, status.HTTP_400_BAD_REQUEST)
+        user = request.user
+        user.pending_image.save(upload.name, upload, save=False)
+        User.objects.filter(pk=user.pk).update(
+            pending_image=user.pending_image.name,
+            image_status=User.ImageStatus.PENDING,
+        )
+        schedule_avatar_processing(user.pk, user.pending_image.name)
+
+        return Response(
+            {
+                "message": "Processing",
+                "image_status": User.ImageStatus.PENDING,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
 
 
 class UserActivity(ListAPIView):
@@ -377,7 +403,11 @@ class UserSearch(ListAPIView):
     View for retrieving a paginated list of filtered User objects. The
     search query must be passed in the query params with the `search` key.
     If a query is not passed, the view will return a paginated list of all
-    User instances.
+    User instances. Supports keyset pagination with the `cursor` param.
+
+    A query containing `@` returns the user with that exact email. Other
+    queries match the words of the query as prefixes of the words of the
+    user's name, using the UserNameToken index.
     """
 
     queryset = (
@@ -385,5 +415,11 @@ class UserSearch(ListAPIView):
     )
 
     serializer_class = FollowSerializer
-    filter_backends = [SearchFilter]
-    search_fields = ["first_name", "last_name", "email"]
+    pagination_class = KeysetPagination
+
+    def filter_queryset(self, queryset):
+        search = self.request.query_params.get("search")
+        if not search:
+            return queryset
+
+        return search_users(queryset, search)